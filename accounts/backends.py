@@ -0,0 +1,44 @@
+# ============================================================================
+# FILE: accounts/backends.py
+# ============================================================================
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.http import Http404
+
+from .models import TeacherProfile
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session user together with its teacher and
+    sub-admin profiles. Views, decorators and the notifications context
+    processor all probe user.teacher_profile / user.subadmin_profile; joined
+    here, those probes (including hasattr() on a missing profile) cost no
+    extra queries.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = (
+                UserModel._default_manager
+                .select_related('teacher_profile', 'subadmin_profile')
+                .get(pk=user_id)
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def get_teacher_or_404(user):
+    """
+    The user's TeacherProfile, or 404. ProfileModelBackend already joined it
+    onto the session user, so this reads the cached relation instead of
+    issuing another query.
+    """
+    try:
+        return user.teacher_profile
+    except TeacherProfile.DoesNotExist:
+        raise Http404("No TeacherProfile matches the given query.")
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.16 on 2026-10-15 22:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_alter_teachersubjectassignment_semester'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'is_read'], name='accounts_ac_user_id_5e33fa_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.16 on 2026-10-15 22:50
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_activitylog_user_is_read_index'),
+    ]
+
+    operations = [
+        # gin_trgm_ops lives in pg_trgm; questionnaires 0015 relies on it too
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='subject_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('code'), name='gin_trgm_ops'), name='subject_code_trgm'),
+        ),
+    ]
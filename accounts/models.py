@@ -2,11 +2,51 @@
 # FILE: accounts/models.py
 # ============================================================================
 
+from django.core.cache import cache
 from django.db import models
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+# Seconds the department/subject filter-dropdown lists stay cached. The
+# cache is per-process (LocMemCache): an edit clears the list only in the
+# worker that made it, so other workers may show the old list this long.
+CHOICES_CACHE_TIMEOUT = 60
+
+
+class ChoicesCacheQuerySet(models.QuerySet):
+    """
+    QuerySet whose bulk writes clear the model's cached dropdown list, the
+    same way save()/delete() do. Covers admin bulk actions, which call
+    queryset.delete()/update() and never reach the model methods.
+    """
+
+    def _bust(self):
+        cache.delete(self.model.CHOICES_CACHE_KEY)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        self._bust()
+        return rows
+
+    def delete(self):
+        result = super().delete()
+        self._bust()
+        return result
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        self._bust()
+        return objs
+
+    def bulk_update(self, *args, **kwargs):
+        rows = super().bulk_update(*args, **kwargs)
+        self._bust()
+        return rows
+
+
 class Department(models.Model):
     name = models.CharField(max_length=200, unique=True)
     code = models.CharField(max_length=20, unique=True)
@@ -14,12 +54,34 @@ class Department(models.Model):
     is_archived = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ChoicesCacheQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    CHOICES_CACHE_KEY = 'department_choices'
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(self.CHOICES_CACHE_KEY)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete(self.CHOICES_CACHE_KEY)
+        return result
+
+    @classmethod
+    def cached_choices(cls):
+        """All departments (id/name/code) for filter dropdowns."""
+        return cache.get_or_set(
+            cls.CHOICES_CACHE_KEY,
+            lambda: list(cls.objects.only('name', 'code')),
+            CHOICES_CACHE_TIMEOUT,
+        )
+
 
 class Subject(models.Model):
     departments = models.ManyToManyField(Department, related_name='subjects')
@@ -29,15 +91,39 @@ class Subject(models.Model):
     is_archived = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ChoicesCacheQuerySet.as_manager()
+
     class Meta:
         ordering = ['code']
+        # Backs the subject__name / subject__code icontains searches
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='subject_name_trgm'),
+            GinIndex(OpClass(Upper('code'), name='gin_trgm_ops'), name='subject_code_trgm'),
+        ]
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    CHOICES_CACHE_KEY = 'subject_choices'
+
     def save(self, *args, **kwargs):
         self.code = self.code.upper()  # always uppercase at DB level
         super().save(*args, **kwargs)
+        cache.delete(self.CHOICES_CACHE_KEY)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete(self.CHOICES_CACHE_KEY)
+        return result
+
+    @classmethod
+    def cached_choices(cls):
+        """All subjects (id/name/code) for filter dropdowns."""
+        return cache.get_or_set(
+            cls.CHOICES_CACHE_KEY,
+            lambda: list(cls.objects.only('name', 'code')),
+            CHOICES_CACHE_TIMEOUT,
+        )
 
     def get_departments_display(self):
         return ", ".join([dept.code for dept in self.departments.all()])
@@ -371,6 +457,7 @@ class ActivityLog(models.Model):
         indexes = [
             models.Index(fields=['activity_type', 'created_at']),
             models.Index(fields=['is_read', 'created_at']),
+            models.Index(fields=['user', 'is_read']),
         ]
 
     def __str__(self):
@@ -10,6 +10,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db.models import Q, Count
 from .models import ActivityLog, TeacherProfile, Department, Subject, SubAdminProfile, Program, ProgramCurriculum
+from .backends import get_teacher_or_404
 from .forms import (
     TeacherCreationForm, TeacherEditForm,
     DepartmentForm, SubjectForm,
@@ -21,7 +22,7 @@ from .models import SchoolYear, TeacherSubjectAssignment
 from .models import Curriculum
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.db import OperationalError
+from django.db import OperationalError, transaction
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import SchoolYear, Semester, TeacherSubjectAssignment
@@ -165,8 +166,7 @@ If you did not expect this email, please contact your administrator immediately.
         )
         return True
     except Exception as e:
-        print(f"EMAIL ERROR: {e}")
-        logger.error(f"Failed to send invite email to {email}: {e}")
+        logger.error("Failed to send invite email to %s: %s", email, e)
         return False
 
 
@@ -1799,7 +1799,7 @@ def teacher_dashboard(request):
     if len(roles) > 1 and not request.session.get('active_role'):
         return redirect('accounts:choose_role')
  
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
  
     from questionnaires.models import Questionnaire, Download
  
@@ -1939,11 +1939,31 @@ def get_subjects_by_department(request):
     return JsonResponse({'subjects': list(subjects)})
 
 
+NOTIFICATION_READ_BATCH_SIZE = 500
+
+
+def _mark_unread_activities_read_in_batches(batch_size=NOTIFICATION_READ_BATCH_SIZE):
+    """
+    Flip every unread ActivityLog to read in small PK batches.
+    Each batch runs in its own short transaction so the update never holds
+    row locks on the whole table while new notifications are being written.
+    """
+    unread = ActivityLog.objects.filter(is_read=False).order_by('pk')
+    total  = 0
+    while True:
+        pks = list(unread.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            total += ActivityLog.objects.filter(pk__in=pks, is_read=False).update(is_read=True)
+    return total
+
+
 @login_required
 def mark_all_notifications_read(request):
     try:
         if request.user.is_staff:
-            updated_count = ActivityLog.objects.filter(is_read=False).update(is_read=True)
+            updated_count = _mark_unread_activities_read_in_batches()
         else:
             updated_count = ActivityLog.objects.filter(
                 user=request.user, is_read=False
@@ -1953,7 +1973,11 @@ def mark_all_notifications_read(request):
         cache.delete(f'activities_{request.user.id}_{"super" if request.user.is_staff else "other"}')
         cache.delete(f'unread_count_{request.user.id}_{"super" if request.user.is_staff else "other"}')
 
-        return JsonResponse({'success': True, 'message': f'{updated_count} notifications marked as read'})
+        return JsonResponse({
+            'success': True,
+            'updated': updated_count,
+            'message': f'{updated_count} notifications marked as read',
+        })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
@@ -1986,9 +2010,8 @@ def get_activity_chart_data(department_filter='all'):
 
 
 def get_department_chart_data():
-    from questionnaires.models import Questionnaire
-
-    departments = Department.objects.annotate(
+    # Only name + the count are rendered, so don't pull description etc.
+    departments = Department.objects.only('name').annotate(
         questionnaire_count=Count('questionnaires')
     ).filter(questionnaire_count__gt=0).order_by('-questionnaire_count')
 
@@ -2213,8 +2236,8 @@ def subadmin_permanent_delete_subject(request, pk):
 @login_required
 @user_passes_test(is_subadmin)
 def subadmin_browse_questionnaires(request):
-    from questionnaires.models import Questionnaire
-    from django.core.paginator import Paginator
+    from questionnaires.models import Questionnaire, ExtractedQuestion
+    from questionnaires.pagination import CachedPagePaginator
 
     department = request.user.subadmin_profile.department
     
@@ -2293,9 +2316,10 @@ def subadmin_browse_questionnaires(request):
             ).values_list('school_year', flat=True).distinct().order_by('-school_year')
         )
     
-    paginator   = Paginator(questionnaires, 9)
+    paginator   = CachedPagePaginator(questionnaires, 9)
     page_number = request.GET.get('page', 1)
     page_obj    = paginator.get_page(page_number)
+    ExtractedQuestion.attach_counts(page_obj)
 
     context = {
         'page_obj':              page_obj,
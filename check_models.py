@@ -1,19 +1,57 @@
+import json
+import time
+from pathlib import Path
+
 from decouple import config
-from google import genai
-
-api_key = config('GEMINI_API_KEY', default='')
-client = genai.Client(api_key=api_key)
-
-print("\n" + "="*60)
-print("Available Gemini Models:")
-print("="*60 + "\n")
-
-try:
-    models = client.models.list()
-    for model in models:
-        print(f"✓ {model.name}")
-        if hasattr(model, 'display_name'):
-            print(f"  Display Name: {model.display_name}")
-        print()
-except Exception as e:
-    print(f"Error: {e}")
\ No newline at end of file
+
+# Model list is cached on disk so repeat runs don't hit the network
+CACHE = Path(__file__).resolve().parent / '.cache' / 'gemini_models.json'
+TTL   = 86400  # seconds
+
+
+def _load_cached_models():
+    """Return the cached model list, or None if missing/stale/unreadable."""
+    try:
+        if time.time() - CACHE.stat().st_mtime > TTL:
+            return None
+        return json.loads(CACHE.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _fetch_models():
+    """Query the Gemini API and persist the result to the cache file."""
+    from google import genai
+
+    api_key = config('GEMINI_API_KEY', default='')
+    client  = genai.Client(api_key=api_key)
+
+    models = [
+        {'name': m.name, 'display_name': getattr(m, 'display_name', None)}
+        for m in client.models.list()
+    ]
+    CACHE.parent.mkdir(parents=True, exist_ok=True)
+    CACHE.write_text(json.dumps(models))
+    return models
+
+
+def main():
+    print("\n" + "="*60)
+    print("Available Gemini Models:")
+    print("="*60 + "\n")
+
+    try:
+        models = _load_cached_models()
+        if models is None:
+            models = _fetch_models()
+        for model in models:
+            print(f"✓ {model['name']}")
+            if model.get('display_name'):
+                print(f"  Display Name: {model['display_name']}")
+            print()
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,9 +8,19 @@ import os
 import json
 import re
 import logging
-from typing import List, Dict, Any
+import functools
+import hashlib
+import itertools
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, ClassVar
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 import anthropic
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator, model_validator
+from questionnaires.models import parse_points
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +28,439 @@ logger = logging.getLogger(__name__)
 try:
     import PyPDF2
     from docx import Document
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
     import openpyxl
 except ImportError:
     pass
 
+try:
+    from lxml import etree
+    _LXML_AVAILABLE = True
+except ImportError:
+    _LXML_AVAILABLE = False
+
 try:
     import fitz  # PyMuPDF — optional, improves PDF colour/column detection
     _PYMUPDF_AVAILABLE = True
 except ImportError:
     _PYMUPDF_AVAILABLE = False
 
+try:
+    import orjson  # optional — C parser for the (usual) well-formed AI reply
+    _fast_json_loads = orjson.loads
+except ImportError:
+    _fast_json_loads = json.loads
+
+try:
+    import json5  # optional — tolerates trailing commas, single quotes, comments
+    _JSON5_AVAILABLE = True
+except ImportError:
+    _JSON5_AVAILABLE = False
+
+
+# One Anthropic client per process — it owns the HTTP connection pool, so
+# reusing it across requests avoids re-doing auth/TLS setup on every upload.
+_CLIENT = None
+
+
+def _get_client():
+    """Return the shared Anthropic client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
+        if not api_key:
+            raise ValueError(
+                "ANTHROPIC_API_KEY not found in settings. "
+                "Please add ANTHROPIC_API_KEY to your .env file."
+            )
+        _CLIENT = anthropic.Anthropic(api_key=api_key)
+    return _CLIENT
+
+
+# WordprocessingML namespace, in lxml's {ns}tag form
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_OFF_VALUES = ('0', 'false', 'off')
+
+# Human-readable descriptions used in the "QUESTION TYPES" block of each prompt
+_TYPE_DESCRIPTIONS_EXTRACT = {
+    'multiple_choice': 'Multiple Choice (has options A, B, C, D)',
+    'true_false':      'True/False (answer is True or False)',
+    'identification':  'Identification (short answer, one word or phrase); answer key may be formatted ([RED]/[BOLD]/[UNDERLINE]/[HIGHLIGHT]/[ITALIC]) or separated by a dash',
+    'essay':           'Essay (requires a long written answer)',
+    'fill_blank':      'Fill in the Blank (sentence with a blank to complete)',
+    'matching':        'Matching Type (match items from two columns)',
+    'enumeration':     'Enumeration (asks to LIST or ENUMERATE multiple items, e.g. "List the 9 types of..."); answer = newline-separated list of all items',
+}
+
+_TYPE_DESCRIPTIONS_GENERATE = {
+    'multiple_choice': 'Multiple Choice (4 options A, B, C, D)',
+    'true_false':      'True/False',
+    'identification':  'Identification (short answer)',
+    'essay':           'Essay (detailed answer)',
+    'fill_blank':      'Fill in the Blank',
+    'matching':        'Matching Type',
+}
+
+
+_DIFFICULTIES = frozenset({'easy', 'medium', 'hard'})
+_MC_OPTIONS   = ('option_a', 'option_b', 'option_c', 'option_d')
+
+
+class AIQuestionSchema(BaseModel):
+    """
+    Shape of one question object in the AI's JSON array.
+
+    Pydantic builds the validator once at import time, so each response is
+    checked and normalised in a single pass. model_dump() always yields the
+    same keys regardless of question type; anything else the AI sends is
+    dropped, and the input dict is never modified.
+    """
+    model_config = ConfigDict(extra='ignore', coerce_numbers_to_str=True)
+
+    type:           str
+    question:       str
+    answer:         Any = ''
+    explanation:    Any = ''
+    difficulty:     Optional[str] = None
+    points:         Optional[int] = None
+    option_a:       Any = None
+    option_b:       Any = None
+    option_c:       Any = None
+    option_d:       Any = None
+    column_a:       Any = None
+    column_b:       Any = None
+    matching_pairs: Any = None
+
+    @field_validator('type', 'question')
+    @classmethod
+    def _not_empty(cls, value):
+        if not value:
+            raise ValueError('must not be empty')
+        return value
+
+    @field_validator('points', mode='before')
+    @classmethod
+    def _loose_points(cls, value):
+        # The AI sometimes sends 1.5, "2.0" or "2 pts". Keep the leading
+        # number; anything unreadable falls to the type default below
+        # rather than failing validation and dropping the question.
+        return parse_points(value)
+
+    @model_validator(mode='after')
+    def _apply_type_defaults(self):
+        # Section headers are always valid — no further checks needed
+        if self.type == 'section_header':
+            if self.difficulty is None:
+                self.difficulty = 'easy'
+            if self.points is None:
+                self.points = 0
+            return self
+
+        # Multiple choice must have all 4 options
+        if self.type == 'multiple_choice' and not all(getattr(self, opt) for opt in _MC_OPTIONS):
+            raise ValueError('multiple_choice question is missing an option')
+
+        # Matching: ensure default arrays — do NOT silently drop the question
+        if self.type == 'matching':
+            self.column_a       = self.column_a       if self.column_a       is not None else []
+            self.column_b       = self.column_b       if self.column_b       is not None else []
+            self.matching_pairs = self.matching_pairs if self.matching_pairs is not None else []
+
+        if self.difficulty not in _DIFFICULTIES:
+            self.difficulty = 'medium'
+        if not self.points:
+            self.points = 1
+        return self
+
+
+# Patterns used on every AI reply by _parse_ai_response
+_FENCE_JSON  = re.compile(r'```json\s*\n(.*?)\n```', re.DOTALL)
+_FENCE_STRIP = re.compile(r'^```\s*\n|\n```\s*$')
+_ARRAY_RE    = re.compile(r'\[.*\]', re.DOTALL)
+# One level of nesting — matching pairs contain inner {…} objects
+_OBJ_RE      = re.compile(r'\{(?:[^{}]|\{[^{}]*\})*\}', re.DOTALL)
+
+# Question numbers, dashes, underscores — see AIQuestionExtractor._is_noise_run
+_NOISE_RUN_RE = re.compile(r'^[\d\s\.\)\-\_]+$')
+
+
+def _json_loads(text: str):
+    """
+    Parse AI output as JSON: strict (orjson/stdlib) first, json5 only if
+    that fails. json5 is pure Python and far slower, so it must never run on
+    the happy path. Raises the strict parser's JSONDecodeError if both fail.
+    """
+    try:
+        return _fast_json_loads(text)
+    except ValueError as strict_err:
+        if not _JSON5_AVAILABLE:
+            raise
+        try:
+            return json5.loads(text)
+        except ValueError:
+            raise strict_err
+
+
+@functools.lru_cache(maxsize=32)
+def _types_list(type_names: tuple, mode: str) -> str:
+    """
+    Bulleted type list for a prompt. Keyed on the (ordered) tuple of names
+    since callers only ever pass a handful of stable combinations.
+    """
+    descriptions = _TYPE_DESCRIPTIONS_GENERATE if mode == 'generate' else _TYPE_DESCRIPTIONS_EXTRACT
+    return '\n'.join(f"- {descriptions.get(t, t)}" for t in type_names)
+
+
+# ============================================================================
+# PDF page rendering (PyMuPDF)
+# ============================================================================
+
+PDF_PARALLEL_MIN_PAGES = 24  # below this, a thread pool costs more than it saves
+PDF_MAX_WORKERS        = 4
+PDF_PAGES_PER_TASK     = 8   # pages rendered per pool task
+PDF_ROW_TOLERANCE      = 15  # px — spans within this y-delta share a row
+
+
+def _pdf_is_reddish(color_int) -> bool:
+    """Return True for colours where R > 150, G < 100, B < 100."""
+    if color_int is None:
+        return False
+    r = (color_int >> 16) & 0xFF
+    g = (color_int >> 8)  & 0xFF
+    b =  color_int        & 0xFF
+    return r > 150 and g < 100 and b < 100
+
+
+def _pdf_span_tag(span):
+    """Return formatting tag for a span, or None."""
+    color = span.get('color', 0)
+    if _pdf_is_reddish(color):
+        return 'RED'
+    flags = span.get('flags', 0)
+    # fitz font flags: bit 4 = italic, bits 3/1 = bold
+    if flags & (1 << 4):
+        return 'ITALIC'
+    if flags & (1 << 3) or flags & (1 << 1):
+        return 'BOLD'
+    return None
+
+
+def _pdf_spans_to_lines(spans):
+    """Cluster spans into logical lines by y0 proximity."""
+    if not spans:
+        return []
+    spans = sorted(spans, key=lambda s: (round(s[1] / 5) * 5, s[0]))
+    lines    = []
+    cur_y    = None
+    cur_line = []
+    for span in spans:
+        y = span[1]
+        if cur_y is None or abs(y - cur_y) > PDF_ROW_TOLERANCE:
+            if cur_line:
+                lines.append(cur_line)
+            cur_line = [span]
+            cur_y    = y
+        else:
+            cur_line.append(span)
+    if cur_line:
+        lines.append(cur_line)
+    return lines
+
+
+def _pdf_render_lines(lines):
+    result = []
+    for line in lines:
+        line_text = ''
+        for (x0, y0, x1, y1, txt, tag) in sorted(line, key=lambda s: s[0]):
+            stripped = txt.strip()
+            if not stripped:
+                line_text += txt
+                continue
+            if tag and not AIQuestionExtractor._is_noise_run(stripped):
+                leading  = txt[: len(txt) - len(txt.lstrip())]
+                trailing = txt[len(txt.rstrip()):]
+                line_text += f'{leading}[{tag}:{stripped}]{trailing}'
+            else:
+                line_text += txt
+        rendered = line_text.strip()
+        if rendered:
+            result.append(rendered)
+    return result
+
+
+def _render_pdf_page(page) -> str:
+    """
+    Render one fitz page with formatting cues:
+      1. Colour detection — spans with reddish colour get tagged [RED:text]
+      2. Multi-column layout — text blocks are sorted by their vertical
+         position within each horizontal column so columns read top-to-bottom
+         rather than being interleaved.
+      3. Bold / italic detection via font flags.
+    Returns '' for pages with no text.
+    """
+    page_width = page.rect.width
+
+    # Collect all text spans with position info ──────────────────────────
+    raw_spans = []  # (x0, y0, x1, y1, text, tag)
+    blocks = page.get_text('dict', flags=fitz.TEXT_PRESERVE_WHITESPACE)['blocks']
+    for block in blocks:
+        if block.get('type') != 0:
+            continue
+        for line in block.get('lines', []):
+            for span in line.get('spans', []):
+                txt = span.get('text', '')
+                if not txt.strip():
+                    continue
+                bbox = span.get('bbox', (0, 0, 0, 0))
+                tag  = _pdf_span_tag(span)
+                raw_spans.append((bbox[0], bbox[1], bbox[2], bbox[3], txt, tag))
+
+    if not raw_spans:
+        return ''
+
+    mid_x       = page_width / 2
+    left_spans  = [s for s in raw_spans if s[0] < mid_x]
+    right_spans = [s for s in raw_spans if s[0] >= mid_x]
+
+    # If there are meaningful right-column spans, render columns separately
+    if right_spans and len(right_spans) >= 2:
+        page_lines = (_pdf_render_lines(_pdf_spans_to_lines(left_spans))
+                      + _pdf_render_lines(_pdf_spans_to_lines(right_spans)))
+    else:
+        page_lines = _pdf_render_lines(_pdf_spans_to_lines(raw_spans))
+
+    return '\n'.join(page_lines)
+
+
+def _render_pdf_range(file_bytes: bytes, start: int, stop: int) -> List[str]:
+    """Thread-pool worker: render pages [start, stop) of a PDF, skipping blank ones."""
+    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    try:
+        return [t for t in (_render_pdf_page(doc[i]) for i in range(start, stop)) if t]
+    finally:
+        doc.close()
+
+
+def _split_content(content: str, target: int, overlap: int) -> List[str]:
+    """
+    Split text into chunks of roughly `target` chars at blank-line
+    (paragraph) boundaries. Each chunk after the first starts with up to
+    `overlap` chars of trailing paragraphs from the previous one, so a
+    question cut at a boundary is still seen whole. A single paragraph
+    longer than `target` is hard-split.
+    """
+    paragraphs = []
+    for para in content.split('\n\n'):
+        while len(para) > target:
+            paragraphs.append(para[:target])
+            para = para[target:]
+        paragraphs.append(para)
+
+    chunks  = []
+    current = []
+    size    = 0
+    for para in paragraphs:
+        if current and size + len(para) > target:
+            chunks.append('\n\n'.join(current))
+            carried = []
+            carried_size = 0
+            for prev in reversed(current):
+                if carried_size + len(prev) > overlap:
+                    break
+                carried.insert(0, prev)
+                carried_size += len(prev) + 2
+            current = carried
+            size    = carried_size
+        current.append(para)
+        size += len(para) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+class _StreamingQuestionParser:
+    """
+    Incrementally decodes the top-level objects of a streamed JSON array
+    (the opening "[" is the assistant prefill, so the stream starts inside
+    the array). Each object is passed to `normalize` as soon as it is
+    complete. `finished` is only set once the closing "]" is reached with
+    every element decoded; otherwise the caller should re-parse `text`.
+    """
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, normalize):
+        self.normalize = normalize
+        self.questions = []
+        self.finished  = False
+        self._chunks   = []
+        self._buf      = ''
+        self._broken   = False
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._chunks)
+
+    def feed(self, chunk: str):
+        self._chunks.append(chunk)
+        if self.finished or self._broken:
+            return
+        self._buf += chunk
+        # An object can only have completed if a closing brace/bracket arrived
+        if '}' not in chunk and ']' not in chunk:
+            return
+
+        buf = self._buf
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == ']':
+                self.finished = True
+                break
+            if buf[pos] != '{':
+                self._broken = True
+                break
+            try:
+                obj, pos = self._decoder.raw_decode(buf, pos)
+            except ValueError:
+                break  # incomplete (or malformed) — wait for more text
+            clean = self.normalize(obj)
+            if clean is not None:
+                self.questions.append(clean)
+
+        # Drop consumed text so later attempts only scan the open object
+        self._buf = buf[pos:]
+
+
+# Rows per INSERT when saving extracted questions
+BULK_CREATE_BATCH_SIZE = 500
+
+# Separates a chunk from the answer-key tail appended to it (all chunks but
+# the last). The last chunk is followed by the tail directly and is the only
+# one that extracts questions from it.
+_ANSWER_KEY_CONTEXT_MARKER = (
+    "\n\n... (document continues) ...\n\n"
+    "=== ANSWER KEY CONTEXT ONLY ===\n"
+    "The text below is the END of the document, included only so you can look "
+    "up answers for the questions above. Do NOT extract any questions from it; "
+    "they are extracted separately.\n\n"
+)
+
+# How long an extraction result is reused for an identical file (seconds)
+EXTRACTION_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# How long the parsed text of a file is kept for retries (seconds)
+TEXT_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def extraction_cache_key(digest: str, type_names: List[str]) -> str:
+    """Cache key for the AI result of one file (sha256 digest) + type selection."""
+    return f"aiqx:{digest}:{'|'.join(sorted(type_names))}"
+
 
 class AIQuestionExtractor:
     """
@@ -38,16 +471,24 @@ class AIQuestionExtractor:
 
     CLAUDE_MODEL = 'claude-haiku-4-5-20251001'
 
-    def __init__(self):
-        api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
-        if not api_key:
-            raise ValueError(
-                "ANTHROPIC_API_KEY not found in settings. "
-                "Please add ANTHROPIC_API_KEY to your .env file."
-            )
-        self.client = anthropic.Anthropic(api_key=api_key)
+    # Claude Haiku supports up to 200k tokens; content beyond this is split
+    # into chunks and sent concurrently (see _extract_with_ai).
+    MAX_CONTENT_CHARS     = 150_000
+    CHUNK_CHARS           = 100_000
+    CHUNK_OVERLAP         = 1_000
+    ANSWER_KEY_TAIL_CHARS = 50_000
+    AI_MAX_WORKERS        = 4
 
-    def process_questionnaire(self, questionnaire, type_names: List[str], mode: str = 'extract') -> List:
+    def __init__(self):
+        self.client = _get_client()
+
+    def process_questionnaire(
+        self,
+        questionnaire,
+        type_names: List[str],
+        mode: str = 'extract',
+        use_cache: bool = True,
+    ) -> List:
         """
         Process the questionnaire file.
 
@@ -56,6 +497,9 @@ class AIQuestionExtractor:
             type_names: List of question type names to look for
             mode: 'extract' — copy questions already in the file (default)
                   'generate' — create new questions based on the file content
+            use_cache: False skips any stored extraction for this file and
+                       calls the AI again (retries); a good result still
+                       replaces the stored one
 
         Returns:
             List of created ExtractedQuestion objects
@@ -74,13 +518,48 @@ class AIQuestionExtractor:
         finally:
             questionnaire.file.close()
 
-        file_content = self._read_file(file_bytes, questionnaire.file_type)
-
-        if not file_content.strip():
-            raise ValueError("File is empty or could not be read")
-
-        # Step 2: Extract or generate questions depending on mode
-        extracted_data = self._extract_with_ai(file_content, type_names, mode=mode)
+        # Extraction is deterministic for a given file + type selection, so
+        # re-uploads of the same file reuse the earlier AI result. Generate
+        # mode is meant to produce fresh questions and is never cached.
+        digest         = hashlib.sha256(file_bytes).hexdigest()
+        cache_key      = None
+        extracted_data = None
+        if mode == 'extract':
+            cache_key = extraction_cache_key(digest, type_names)
+            if use_cache:
+                extracted_data = cache.get(cache_key)
+            if extracted_data is not None:
+                logger.info("Reusing cached extraction for questionnaire pk=%s", getattr(questionnaire, 'pk', '?'))
+
+        if extracted_data is None:
+            # Generate mode only needs enough material to write questions from,
+            # so the readers can stop early. Extract mode must read to the end —
+            # the answer key usually lives on the last pages.
+            max_chars = self.MAX_CONTENT_CHARS if mode == 'generate' else None
+
+            # Retries with a different type selection, and generate runs on a
+            # file that was already extracted, reuse the parsed text. Only
+            # complete reads are cached; a bounded read is a prefix of one.
+            text_key     = f"aitxt:{digest}:{questionnaire.file_type}"
+            file_content = cache.get(text_key)
+            if file_content is None:
+                file_content = self._read_file(file_bytes, questionnaire.file_type, max_chars=max_chars)
+                if max_chars is None:
+                    cache.set(text_key, file_content, timeout=TEXT_CACHE_TIMEOUT)
+            elif max_chars is not None:
+                file_content = file_content[:max_chars]
+
+            if not file_content.strip():
+                raise ValueError("File is empty or could not be read")
+
+            # Step 2: Extract or generate questions depending on mode
+            extracted_data, complete = self._extract_with_ai(file_content, type_names, mode=mode)
+
+            # Only a full, non-empty answer is worth replaying. An empty list
+            # or one missing failed chunks is usually a transient API problem,
+            # and caching it would hand the same bad result to every retry.
+            if cache_key and complete and extracted_data:
+                cache.set(cache_key, extracted_data, timeout=EXTRACTION_CACHE_TIMEOUT)
 
         # Step 3: Save questions to the database
         logger.info(
@@ -98,19 +577,28 @@ class AIQuestionExtractor:
                 len(qd.get('column_b', [])) if isinstance(qd.get('column_b'), list) else qd.get('column_b', 'N/A'),
             )
 
-        created_questions = []
+        # Resolve every question type up front — one SELECT, plus one INSERT
+        # per type the AI returned that doesn't exist yet.
+        type_names_seen = {qd['type'] for qd in extracted_data}
+        type_map = {
+            qt.name: qt
+            for qt in QuestionType.objects.filter(name__in=type_names_seen)
+        }
+        for q_type_name in type_names_seen - type_map.keys():
+            type_map[q_type_name], created = QuestionType.objects.get_or_create(
+                name=q_type_name,
+                defaults={'description': '', 'is_active': True},
+            )
+            if created:
+                logger.warning(
+                    "QuestionType '%s' did not exist — created it automatically",
+                    q_type_name,
+                )
+
+        new_questions = []
         for question_data in extracted_data:
             try:
                 q_type_name = question_data['type']
-                question_type, created = QuestionType.objects.get_or_create(
-                    name=q_type_name,
-                    defaults={'description': '', 'is_active': True},
-                )
-                if created:
-                    logger.warning(
-                        "QuestionType '%s' did not exist — created it automatically",
-                        q_type_name,
-                    )
 
                 # ── Matching type: store column_a/column_b/pairs as JSON ──────
                 if q_type_name == 'matching':
@@ -118,10 +606,9 @@ class AIQuestionExtractor:
                     col_b = question_data.get('column_b', [])
                     pairs = question_data.get('matching_pairs', [])
 
-                    import json as _json_inner
-                    option_a = _json_inner.dumps(col_a, ensure_ascii=False) if col_a else None
-                    option_b = _json_inner.dumps(col_b, ensure_ascii=False) if col_b else None
-                    option_c = _json_inner.dumps(pairs, ensure_ascii=False)
+                    option_a = json.dumps(col_a, ensure_ascii=False) if col_a else None
+                    option_b = json.dumps(col_b, ensure_ascii=False) if col_b else None
+                    option_c = json.dumps(pairs, ensure_ascii=False)
                     option_d = None
 
                     correct_answer = question_data.get('answer', '')
@@ -141,39 +628,46 @@ class AIQuestionExtractor:
                     option_d       = question_data.get('option_d')
                     correct_answer = question_data.get('answer', '')
 
-                question = ExtractedQuestion.objects.create(
+                new_questions.append(ExtractedQuestion(
                     questionnaire=questionnaire,
-                    question_type=question_type,
+                    question_type=type_map[q_type_name],
                     question_text=question_data['question'],
                     option_a=option_a,
                     option_b=option_b,
                     option_c=option_c,
                     option_d=option_d,
-                    correct_answer=correct_answer,
+                    # NOT NULL column — a null here would fail the whole batch
+                    correct_answer=correct_answer if correct_answer is not None else '',
                     explanation=question_data.get('explanation', ''),
                     points=question_data.get('points', 1),
                     difficulty=question_data.get('difficulty', 'medium'),
                     is_approved=False
-                )
-                created_questions.append(question)
+                ))
             except Exception as e:
-                logger.error("Error saving question: %s", e, exc_info=True)
+                logger.error("Error preparing question: %s", e, exc_info=True)
                 continue
 
+        # One multi-row INSERT per batch instead of a round-trip per question.
+        # PKs are populated on PostgreSQL. Bad rows are coerced or dropped
+        # first so one can't fail the whole batch.
+        new_questions = ExtractedQuestion.storable(new_questions)
+        with transaction.atomic():
+            created_questions = ExtractedQuestion.objects.bulk_create(
+                new_questions, batch_size=BULK_CREATE_BATCH_SIZE,
+            )
+
         return created_questions
 
-    def _read_file(self, file_bytes: bytes, file_type: str) -> str:
-        """Read content from various file types, given raw bytes instead of a path."""
-        if file_type == 'txt':
-            return self._read_txt(file_bytes)
-        elif file_type == 'pdf':
-            return self._read_pdf(file_bytes)
-        elif file_type in ['docx', 'doc']:
-            return self._read_docx(file_bytes)
-        elif file_type in ['xlsx', 'xls']:
-            return self._read_xlsx(file_bytes)
-        else:
+    def _read_file(self, file_bytes: bytes, file_type: str, max_chars: Optional[int] = None) -> str:
+        """
+        Read content from various file types, given raw bytes instead of a path.
+        If max_chars is set, the PDF/DOCX/XLSX readers stop once they have
+        collected at least that many characters.
+        """
+        reader = self._READERS.get(file_type)
+        if reader is None:
             raise ValueError(f"Unsupported file type: {file_type}")
+        return reader(self, file_bytes, max_chars)
 
     # -------------------------------------------------------------------------
     # Formatting detection helpers (used by both PDF and DOCX readers)
@@ -190,7 +684,6 @@ class AIQuestionExtractor:
         (RED colour is the strongest signal that something is an answer key.)
         """
         try:
-            from docx.oxml.ns import qn
             rPr = run._r.find(qn('w:rPr'))
             if rPr is not None:
 
@@ -252,7 +745,7 @@ class AIQuestionExtractor:
         if not stripped:
             return True
         # Purely numeric / punctuation runs (question numbers, dashes, underscores)
-        if re.match(r'^[\d\s\.\)\-\_]+$', stripped):
+        if _NOISE_RUN_RE.match(stripped):
             return True
         # Very short single non-alpha character
         if len(stripped) <= 1 and not stripped.isalpha():
@@ -282,10 +775,11 @@ class AIQuestionExtractor:
         # Fallback: use para.text if all runs were plain (handles edge cases)
         return result if result else para.text.strip()
 
-    def _read_txt(self, file_bytes: bytes) -> str:
+    def _read_txt(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
+        # Already fully in memory — max_chars is accepted for a uniform reader signature
         return file_bytes.decode('utf-8', errors='ignore')
 
-    def _read_pdf(self, file_bytes: bytes) -> str:
+    def _read_pdf(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
         """
         Extract text from a PDF with formatting cues preserved where possible.
 
@@ -296,197 +790,272 @@ class AIQuestionExtractor:
         """
         if _PYMUPDF_AVAILABLE:
             try:
-                return self._read_pdf_pymupdf(file_bytes)
+                return self._read_pdf_pymupdf(file_bytes, max_chars)
             except Exception as e:
                 logger.warning("PyMuPDF failed (%s), falling back to PyPDF2", e)
 
         # ── PyPDF2 fallback ────────────────────────────────────────────────
-        text = []
+        text  = []
+        total = 0
         try:
             pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
             for page in pdf_reader.pages:
                 page_text = page.extract_text()
                 if page_text:
                     text.append(page_text)
+                    total += len(page_text)
+                    if max_chars and total >= max_chars:
+                        break
         except Exception as e:
             raise ValueError(f"Failed to read PDF: {str(e)}")
         return '\n\n'.join(text)
 
-    def _read_pdf_pymupdf(self, file_bytes: bytes) -> str:
+    def _read_pdf_pymupdf(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
         """
-        PyMuPDF-based PDF extraction.
-
-        Key features:
-          1. Colour detection — spans with reddish colour get tagged [RED:text]
-          2. Multi-column layout — text blocks are sorted by their vertical
-             position within each horizontal column so columns read top-to-bottom
-             rather than being interleaved.
-          3. Bold / italic detection via font flags.
+        PyMuPDF-based PDF extraction (see _render_pdf_page for the layout rules).
+
+        Short documents are rendered sequentially. Longer ones are split into
+        small page ranges rendered on a few threads (PyMuPDF releases the GIL
+        while it extracts text). A fitz Document is not thread-safe, so each
+        task opens its own from the shared bytes. Only a handful of ranges
+        are in flight at once and results are read in page order, so no new
+        range is started once max_chars is reached.
         """
-        COLUMN_BAND_TOLERANCE = 15  # px — spans within this y-delta share a row
-
-        def is_reddish(color_int):
-            """Return True for colours where R > 150, G < 100, B < 100."""
-            if color_int is None:
-                return False
-            r = (color_int >> 16) & 0xFF
-            g = (color_int >> 8)  & 0xFF
-            b =  color_int        & 0xFF
-            return r > 150 and g < 100 and b < 100
-
-        def span_tag(span):
-            """Return formatting tag for a span, or None."""
-            color = span.get('color', 0)
-            if is_reddish(color):
-                return 'RED'
-            flags = span.get('flags', 0)
-            # fitz font flags: bit 4 = italic, bits 3/1 = bold
-            if flags & (1 << 4):
-                return 'ITALIC'
-            if flags & (1 << 3) or flags & (1 << 1):
-                return 'BOLD'
+        try:
+            doc = fitz.open(stream=file_bytes, filetype="pdf")
+            page_count = doc.page_count
+            if page_count < PDF_PARALLEL_MIN_PAGES:
+                pages_text = []
+                total      = 0
+                for page in doc:
+                    page_text = _render_pdf_page(page)
+                    if page_text:
+                        pages_text.append(page_text)
+                        total += len(page_text)
+                        if max_chars and total >= max_chars:
+                            break
+                doc.close()
+                return '\n\n'.join(pages_text)
+            doc.close()
+
+            workers = min(PDF_MAX_WORKERS, os.cpu_count() or 1)
+            ranges  = iter([
+                (start, min(start + PDF_PAGES_PER_TASK, page_count))
+                for start in range(0, page_count, PDF_PAGES_PER_TASK)
+            ])
+
+            pages_text = []
+            total      = 0
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque(
+                    executor.submit(_render_pdf_range, file_bytes, a, b)
+                    for a, b in itertools.islice(ranges, workers)
+                )
+                while pending:
+                    for page_text in pending.popleft().result():
+                        pages_text.append(page_text)
+                        total += len(page_text)
+                        if max_chars and total >= max_chars:
+                            for future in pending:
+                                future.cancel()
+                            return '\n\n'.join(pages_text)
+                    next_range = next(ranges, None)
+                    if next_range:
+                        pending.append(executor.submit(_render_pdf_range, file_bytes, *next_range))
+            return '\n\n'.join(pages_text)
+
+        except Exception as e:
+            raise ValueError(f"PyMuPDF error: {str(e)}") from e
+
+    # -------------------------------------------------------------------------
+    # DOCX — streaming lxml reader (no python-docx object model)
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _get_xml_run_format_tag(r) -> str:
+        """
+        Same rules as _get_run_format_tag, but reads the raw <w:r> element
+        directly instead of going through a python-docx Run wrapper.
+        """
+        rPr = r.find(f'{_W}rPr')
+        if rPr is None:
             return None
 
-        def spans_to_lines(spans):
-            """Cluster spans into logical lines by y0 proximity."""
-            if not spans:
-                return []
-            spans = sorted(spans, key=lambda s: (round(s[1] / 5) * 5, s[0]))
-            lines    = []
-            cur_y    = None
-            cur_line = []
-            for span in spans:
-                y = span[1]
-                if cur_y is None or abs(y - cur_y) > COLUMN_BAND_TOLERANCE:
-                    if cur_line:
-                        lines.append(cur_line)
-                    cur_line = [span]
-                    cur_y    = y
-                else:
-                    cur_line.append(span)
-            if cur_line:
-                lines.append(cur_line)
-            return lines
-
-        def render_lines(lines):
-            result = []
-            for line in lines:
-                line_text = ''
-                for (x0, y0, x1, y1, txt, tag) in sorted(line, key=lambda s: s[0]):
-                    stripped = txt.strip()
-                    if not stripped:
-                        line_text += txt
-                        continue
-                    if tag and not self._is_noise_run(stripped):
-                        leading  = txt[: len(txt) - len(txt.lstrip())]
-                        trailing = txt[len(txt.rstrip()):]
-                        line_text += f'{leading}[{tag}:{stripped}]{trailing}'
-                    else:
-                        line_text += txt
-                rendered = line_text.strip()
-                if rendered:
-                    result.append(rendered)
-            return result
+        color_el = rPr.find(f'{_W}color')
+        if color_el is not None:
+            val = (color_el.get(f'{_W}val') or '').strip()
+            if val and val.lower() not in ('auto', '000000', 'ffffff') and len(val) == 6:
+                try:
+                    r_v = int(val[0:2], 16)
+                    g_v = int(val[2:4], 16)
+                    b_v = int(val[4:6], 16)
+                    if r_v > 150 and g_v < 100 and b_v < 100:
+                        return 'RED'
+                except ValueError:
+                    pass
+
+        hl = rPr.find(f'{_W}highlight')
+        if hl is not None:
+            hl_val = (hl.get(f'{_W}val') or '').lower()
+            if hl_val and hl_val != 'none':
+                return 'HIGHLIGHT'
+
+        u = rPr.find(f'{_W}u')
+        if u is not None and (u.get(f'{_W}val') or 'single').lower() != 'none':
+            return 'UNDERLINE'
+
+        for el_name, tag in (('b', 'BOLD'), ('i', 'ITALIC')):
+            el = rPr.find(f'{_W}{el_name}')
+            if el is not None and (el.get(f'{_W}val') or 'true').lower() not in _W_OFF_VALUES:
+                return tag
 
-        pages_text = []
-        try:
-            # fitz supports opening directly from an in-memory byte stream via
-            # the stream= parameter — no local path required. This is the key
-            # change from the original fitz.open(file_path).
-            doc = fitz.open(stream=file_bytes, filetype="pdf")
-            for page in doc:
-                page_width = page.rect.width
-
-                # Collect all text spans with position info ──────────────────
-                raw_spans = []  # (x0, y0, x1, y1, text, tag)
-                blocks = page.get_text('dict', flags=fitz.TEXT_PRESERVE_WHITESPACE)['blocks']
-                for block in blocks:
-                    if block.get('type') != 0:
-                        continue
-                    for line in block.get('lines', []):
-                        for span in line.get('spans', []):
-                            txt = span.get('text', '')
-                            if not txt.strip():
-                                continue
-                            bbox = span.get('bbox', (0, 0, 0, 0))
-                            tag  = span_tag(span)
-                            raw_spans.append((bbox[0], bbox[1], bbox[2], bbox[3], txt, tag))
-
-                if not raw_spans:
-                    continue
+        return None
+
+    @staticmethod
+    def _xml_run_text(r) -> str:
+        """Text of a <w:r>, translating tabs/breaks the way python-docx does."""
+        parts = []
+        for child in r:
+            name = child.tag
+            if name == f'{_W}t':
+                parts.append(child.text or '')
+            elif name in (f'{_W}tab', f'{_W}ptab'):
+                parts.append('\t')
+            elif name in (f'{_W}br', f'{_W}cr'):
+                parts.append('\n')
+            elif name == f'{_W}noBreakHyphen':
+                parts.append('-')
+        return ''.join(parts)
 
-                mid_x       = page_width / 2
-                left_spans  = [s for s in raw_spans if s[0] < mid_x]
-                right_spans = [s for s in raw_spans if s[0] >= mid_x]
+    @staticmethod
+    def _xml_plain_text(el) -> str:
+        """
+        Every <w:t> under an element (text boxes included), untagged. Table
+        cells are read this way: answer keys laid out in tables reach the
+        prompt as plain text, exactly as they always have.
+        """
+        return ''.join(t.text for t in el.iter(f'{_W}t') if t.text).strip()
 
-                # If there are meaningful right-column spans, render columns separately
-                if right_spans and len(right_spans) >= 2:
-                    left_lines  = spans_to_lines(left_spans)
-                    right_lines = spans_to_lines(right_spans)
-                    page_lines  = render_lines(left_lines) + render_lines(right_lines)
+    def _xml_para_with_formatting(self, p) -> str:
+        """lxml counterpart of _extract_para_with_formatting for a <w:p> element."""
+        parts = []
+        for r in p.iterchildren(f'{_W}r'):
+            text = self._xml_run_text(r)
+            if not text:
+                continue
+            tag = self._get_xml_run_format_tag(r)
+            if tag and not self._is_noise_run(text):
+                stripped = text.strip()
+                leading  = text[: len(text) - len(text.lstrip())]
+                trailing = text[len(text.rstrip()):]
+                parts.append(f"{leading}[{tag}:{stripped}]{trailing}")
+            else:
+                parts.append(text)
+        result = ''.join(parts).strip()
+        if result:
+            return result
+        # Same as python-docx para.text: direct runs plus hyperlinked runs
+        return ''.join(
+            self._xml_run_text(r)
+            for r in p.xpath('./w:r | ./w:hyperlink/w:r', namespaces={'w': _W[1:-1]})
+        ).strip()
+
+    def _read_docx_xml(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
+        """
+        Stream word/document.xml with lxml.iterparse and emit the same text
+        as _read_docx_python_docx. Only top-level body paragraphs and tables
+        are rendered; each is cleared once handled so memory stays flat.
+        """
+        text  = []
+        total = 0
+        with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf, zf.open('word/document.xml') as fh:
+            for _, el in etree.iterparse(fh, events=('end',), tag=(f'{_W}p', f'{_W}tbl')):
+                parent = el.getparent()
+                if parent is None or parent.tag != f'{_W}body':
+                    continue  # nested inside a table — rendered with the table
+
+                before = len(text)
+                if el.tag == f'{_W}p':
+                    para_text = self._xml_para_with_formatting(el)
+                    if para_text:
+                        text.append(para_text)
                 else:
-                    all_lines  = spans_to_lines(raw_spans)
-                    page_lines = render_lines(all_lines)
+                    for row in el.iter(f'{_W}tr'):
+                        row_cells = []
+                        for cell in row.iter(f'{_W}tc'):
+                            cell_parts = []
+                            for para_elem in cell.iter(f'{_W}p'):
+                                pt = self._xml_plain_text(para_elem)
+                                if pt:
+                                    cell_parts.append(pt)
+                            cell_text = ' '.join(cell_parts).strip()
+                            if cell_text:
+                                row_cells.append(cell_text)
+                        if row_cells:
+                            text.append('  |  '.join(row_cells))
 
-                pages_text.append('\n'.join(page_lines))
+                el.clear()
+                while el.getprevious() is not None:
+                    del parent[0]
 
-            doc.close()
-            return '\n\n'.join(pages_text)
+                total += sum(len(t) for t in text[before:])
+                if max_chars and total >= max_chars:
+                    break
 
-        except Exception as e:
-            raise ValueError(f"PyMuPDF error: {str(e)}") from e
+        return '\n'.join(text)
 
-    def _read_docx(self, file_bytes: bytes) -> str:
+    def _read_docx(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
         """
         Extract DOCX text in reading order, preserving answer-key formatting
         cues ([RED:...], [BOLD:...], etc.).
+        Uses the streaming lxml reader; python-docx is kept as a fallback for
+        files whose package layout the fast path can't handle.
+        """
+        if _LXML_AVAILABLE:
+            try:
+                return self._read_docx_xml(file_bytes, max_chars)
+            except Exception as e:
+                logger.warning("Streaming DOCX read failed (%s), falling back to python-docx", e)
+        return self._read_docx_python_docx(file_bytes, max_chars)
+
+    def _read_docx_python_docx(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
+        """
+        python-docx based DOCX reader.
         Also reads table cells so answer keys placed in tables are captured.
         """
         _WNS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
 
-        def _plain_text(element):
-            """Fallback: extract plain text from an XML element."""
-            return ''.join(
-                node.text for node in element.iter()
-                if node.tag.endswith('}t') and node.text
-            ).strip()
-
         try:
             # python-docx's Document() accepts a file-like object directly —
             # this is the key change from the original Document(file_path).
             doc = Document(io.BytesIO(file_bytes))
             text = []
 
-            # Build element → paragraph object map so we can use
-            # _extract_para_with_formatting (which needs a python-docx Para).
-            # doc.paragraphs includes ALL paragraphs, including those in tables.
-            para_map = {p._element: p for p in doc.paragraphs}
+            # _extract_para_with_formatting needs a python-docx Paragraph;
+            # wrap each w:p as it is reached instead of materialising
+            # doc.paragraphs up front (which also skips table paragraphs).
+            body = doc._body
 
+            total = 0
             for block in doc.element.body:
-                tag = block.tag.split('}')[-1] if '}' in block.tag else block.tag
+                if max_chars and total >= max_chars:
+                    break
+                tag    = block.tag.split('}')[-1] if '}' in block.tag else block.tag
+                before = len(text)
 
                 if tag == 'p':
-                    para = para_map.get(block)
-                    if para is not None:
-                        para_text = self._extract_para_with_formatting(para)
-                    else:
-                        para_text = _plain_text(block)
-
+                    para_text = self._extract_para_with_formatting(Paragraph(block, body))
                     if para_text:
                         text.append(para_text)
 
                 elif tag == 'tbl':
-                    # Table — read every cell row by row with formatting cues
+                    # Table — read every cell row by row as plain text
                     for row in block.iter(f'{{{_WNS}}}tr'):
                         row_cells = []
                         for cell in row.iter(f'{{{_WNS}}}tc'):
                             cell_parts = []
                             for para_elem in cell.iter(f'{{{_WNS}}}p'):
-                                para = para_map.get(para_elem)
-                                if para is not None:
-                                    pt = self._extract_para_with_formatting(para)
-                                else:
-                                    pt = _plain_text(para_elem)
+                                pt = self._xml_plain_text(para_elem)
                                 if pt:
                                     cell_parts.append(pt)
                             cell_text = ' '.join(cell_parts).strip()
@@ -495,41 +1064,120 @@ class AIQuestionExtractor:
                         if row_cells:
                             text.append('  |  '.join(row_cells))
 
+                total += sum(len(t) for t in text[before:])
+
             return '\n'.join(text)
         except Exception as e:
             raise ValueError(f"Failed to read DOCX: {str(e)}")
 
-    def _read_xlsx(self, file_bytes: bytes) -> str:
+    def _read_xlsx(self, file_bytes: bytes, max_chars: Optional[int] = None) -> str:
         try:
             # openpyxl's load_workbook() accepts a file-like object directly —
             # this is the key change from the original load_workbook(file_path).
-            workbook = openpyxl.load_workbook(io.BytesIO(file_bytes))
-            text = []
-            for sheet in workbook.worksheets:
-                text.append(f"\n=== {sheet.title} ===\n")
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = '\t'.join([str(cell) if cell is not None else '' for cell in row])
-                    if row_text.strip():
-                        text.append(row_text)
-            return '\n'.join(text)
+            # read_only streams rows straight from the sheet XML instead of
+            # building a full cell graph; data_only returns cached values
+            # rather than formula strings.
+            workbook = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+            try:
+                text  = []
+                total = 0
+                for sheet in workbook.worksheets:
+                    if max_chars and total >= max_chars:
+                        break
+                    text.append(f"\n=== {sheet.title} ===\n")
+                    for row in sheet.iter_rows(values_only=True):
+                        # read_only pads rows to the sheet width with None;
+                        # tuple.count skips blank rows without formatting them.
+                        if row.count(None) == len(row):
+                            continue
+                        # A list comprehension is the fastest join input here —
+                        # faster than a generator or map() with a helper.
+                        row_text = '\t'.join([str(cell) if cell is not None else '' for cell in row])
+                        if row_text.strip():
+                            text.append(row_text)
+                            total += len(row_text)
+                            if max_chars and total >= max_chars:
+                                break
+                return '\n'.join(text)
+            finally:
+                workbook.close()
         except Exception as e:
             raise ValueError(f"Failed to read XLSX: {str(e)}")
 
-    def _extract_with_ai(self, content: str, type_names: List[str], mode: str = 'extract') -> List[Dict[str, Any]]:
+    # file_type → reader, used by _read_file. Each takes (self, file_bytes, max_chars).
+    _READERS: ClassVar[Dict[str, Callable[..., str]]] = {
+        'txt':  _read_txt,
+        'pdf':  _read_pdf,
+        'docx': _read_docx,
+        'doc':  _read_docx,
+        'xlsx': _read_xlsx,
+        'xls':  _read_xlsx,
+    }
+
+    def _extract_with_ai(self, content: str, type_names: List[str], mode: str = 'extract') -> tuple:
         """
         Scan or generate questions depending on mode.
         mode='extract'  → copies questions already written in the file
         mode='generate' → creates new questions based on the file content
+
+        Returns (questions, complete). complete is False when some chunks
+        failed and only the others' questions came back.
+
+        Content longer than MAX_CONTENT_CHARS is split at paragraph
+        boundaries and the chunks are sent concurrently, so the whole
+        document is seen instead of only its head and tail. In extract mode
+        the END of the document (where answer keys live) is scanned for
+        questions only by the last chunk, which it continues; every other
+        chunk gets it as look-up context marked not to be extracted from.
+        Results are merged in document order.
         """
+        if len(content) <= self.MAX_CONTENT_CHARS:
+            return self._call_ai(content, type_names, mode), True
+
+        if mode == 'extract':
+            tail   = content[-self.ANSWER_KEY_TAIL_CHARS:]
+            chunks = _split_content(content[:-self.ANSWER_KEY_TAIL_CHARS], self.CHUNK_CHARS, self.CHUNK_OVERLAP)
+            chunks = [chunk + _ANSWER_KEY_CONTEXT_MARKER + tail for chunk in chunks[:-1]] + [chunks[-1] + tail]
+        else:
+            chunks = _split_content(content, self.CHUNK_CHARS, self.CHUNK_OVERLAP)
 
-        # Claude Haiku supports up to 200k tokens.
-        # Always preserve the END of the document — that's where answer keys live.
-        MAX_CHARS = 150_000
-        if len(content) > MAX_CHARS:
-            head = content[:100_000]
-            tail = content[-50_000:]
-            content = head + "\n\n... (middle section truncated) ...\n\n" + tail
+        logger.info("Content is %d chars — sending %d chunks to the AI", len(content), len(chunks))
 
+        results = []
+        errors  = []
+        # max_workers doubles as the cap on concurrent API requests
+        with ThreadPoolExecutor(max_workers=min(self.AI_MAX_WORKERS, len(chunks))) as executor:
+            futures = [executor.submit(self._call_ai, chunk, type_names, mode) for chunk in chunks]
+            for future in futures:
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    errors.append(e)
+
+        if errors and not results:
+            raise errors[0]
+        if errors:
+            logger.warning("%d of %d chunks failed; keeping the rest", len(errors), len(chunks))
+
+        # Chunk overlap (and a chunk that extracts from its answer-key
+        # context anyway) can return the same question twice. Keep the LAST
+        # occurrence: an overlapped question sits at the start of the next
+        # chunk either way, and a tail question stays with the last chunk
+        # instead of landing between the first chunk's questions and the
+        # second's. Rows are saved — and exams ordered — in this order.
+        merged = []
+        seen   = set()
+        for q in reversed(results):
+            key = (q['type'], ' '.join(str(q['question']).split()).casefold())
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(q)
+        merged.reverse()
+        return merged, not errors
+
+    def _call_ai(self, content: str, type_names: List[str], mode: str) -> List[Dict[str, Any]]:
+        """Send one prompt to Claude and return the parsed question dicts."""
         if mode == 'generate':
             prompt = self._build_generation_prompt(content, type_names)
             temperature = 0.7
@@ -538,7 +1186,8 @@ class AIQuestionExtractor:
             temperature = 0.1
 
         try:
-            response = self.client.messages.create(
+            parser = _StreamingQuestionParser(self._normalize)
+            with self.client.messages.stream(
                 model=self.CLAUDE_MODEL,
                 max_tokens=8192,
                 temperature=temperature,
@@ -552,12 +1201,18 @@ class AIQuestionExtractor:
                     {"role": "user",      "content": prompt},
                     {"role": "assistant", "content": "["},   # force JSON array start
                 ],
-            )
+            ) as stream:
+                # Questions are decoded and validated as each object
+                # completes, overlapping parsing with the network stream.
+                for text in stream.text_stream:
+                    parser.feed(text)
+
+            if parser.finished:
+                return parser.questions
 
+            # Not a clean array — let the lenient parser/recovery have a go.
             # Claude prefill: the response continues after our "[" prefix
-            raw = "[" + response.content[0].text
-            questions = self._parse_ai_response(raw)
-            return questions
+            return self._parse_ai_response("[" + parser.text)
 
         except Exception as e:
             logger.error("Anthropic API error: %s", e, exc_info=True)
@@ -569,21 +1224,119 @@ class AIQuestionExtractor:
         answers from any answer key section (inline or end-of-document).
         """
 
-        type_descriptions = {
-            'multiple_choice': 'Multiple Choice (has options A, B, C, D)',
-            'true_false':      'True/False (answer is True or False)',
-            'identification':  'Identification (short answer, one word or phrase); answer key may be formatted ([RED]/[BOLD]/[UNDERLINE]/[HIGHLIGHT]/[ITALIC]) or separated by a dash',
-            'essay':           'Essay (requires a long written answer)',
-            'fill_blank':      'Fill in the Blank (sentence with a blank to complete)',
-            'matching':        'Matching Type (match items from two columns)',
-            'enumeration':     'Enumeration (asks to LIST or ENUMERATE multiple items, e.g. "List the 9 types of..."); answer = newline-separated list of all items',
-        }
+        types_list = _types_list(tuple(type_names), 'extract')
 
-        types_list = '\n'.join([
-            f"- {type_descriptions.get(t, t)}" for t in type_names
-        ])
+        return _EXTRACTION_PROMPT_TEMPLATE.format(
+            types_list=types_list,
+            type_names=type_names,
+            content=content,
+        )
 
-        prompt = f"""You are scanning a test questionnaire document. Your job is to:
+    def _build_generation_prompt(self, content: str, type_names: List[str]) -> str:
+        """
+        Prompt for GENERATING new questions based on the file content.
+        Used by the generate_questionnaire view.
+        """
+
+        types_list = _types_list(tuple(type_names), 'generate')
+
+        return _GENERATION_PROMPT_TEMPLATE.format(
+            types_list=types_list,
+            type_names=type_names,
+            content=content,
+        )
+
+    def _parse_ai_response(self, response_text: str) -> List[Dict[str, Any]]:
+        """Parse Claude's JSON response into a list of question dicts."""
+
+        response_text = response_text.strip()
+
+        # Happy path: a bare array (always the case with the "[" prefill)
+        # needs no fence stripping or array search.
+        if not response_text.startswith('['):
+            # Remove markdown code blocks if present
+            if '```' in response_text:
+                match = _FENCE_JSON.search(response_text)
+                if match:
+                    response_text = match.group(1).strip()
+                else:
+                    response_text = _FENCE_STRIP.sub('', response_text).strip()
+
+            # Find JSON array if response has extra text around it
+            if not response_text.startswith('['):
+                json_match = _ARRAY_RE.search(response_text)
+                if json_match:
+                    response_text = json_match.group(0)
+
+        try:
+            questions = _json_loads(response_text)
+
+            if not isinstance(questions, list):
+                return []
+
+            validated = []
+            for i, q in enumerate(questions):
+                clean = self._normalize(q)
+                if clean is not None:
+                    validated.append(clean)
+                else:
+                    logger.debug("Skipping question %d — failed validation", i + 1)
+
+            logger.debug("Found %d valid questions in AI response", len(validated))
+            return validated
+
+        except json.JSONDecodeError as e:
+            logger.error("Failed to parse AI response: %s\nPreview: %s", e, response_text[:500])
+
+            # Try to recover individual objects from a malformed response.
+            # The pattern handles one level of nesting (needed for matching pairs
+            # which contain inner {…} objects inside the matching_pairs array).
+            try:
+                objects = _OBJ_RE.findall(response_text)
+                recovered = []
+                for obj_str in objects:
+                    try:
+                        clean = self._normalize(_json_loads(obj_str))
+                        if clean is not None:
+                            recovered.append(clean)
+                    except ValueError:
+                        continue
+                if recovered:
+                    logger.warning("Recovered %d questions from malformed response", len(recovered))
+                    return recovered
+            except Exception as recover_err:
+                logger.error("Recovery attempt failed: %s", recover_err)
+
+            raise ValueError(f"Could not parse AI response: {str(e)}") from e
+
+    def _normalize(self, question: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Validate a question against AIQuestionSchema.
+        Returns a new fixed-key dict (defaults filled in), or None if the
+        question lacks the minimum required fields.
+        """
+        try:
+            return AIQuestionSchema.model_validate(question).model_dump()
+        except ValidationError:
+            return None
+
+
+@functools.lru_cache(maxsize=1)
+def get_extractor():
+    """
+    Factory function to get an extractor instance.
+    The extractor holds no per-request state, so one instance is shared.
+    """
+    return AIQuestionExtractor()
+
+
+# ============================================================================
+# PROMPT TEMPLATES
+# ============================================================================
+# Built once at import; filled with str.format() per request. Literal braces
+# in the JSON examples are doubled.
+
+_EXTRACTION_PROMPT_TEMPLATE = """You are scanning a test questionnaire document. Your job is to:
   1. Extract every question exactly as written.
   2. Find the answer for each question from the answer key — either a separate key section
      OR inline formatting/dash patterns within the question itself.
@@ -880,28 +1633,7 @@ Examples (section header appears once; individual questions keep only their orig
 
 If no questions found, return: []"""
 
-        return prompt
-
-    def _build_generation_prompt(self, content: str, type_names: List[str]) -> str:
-        """
-        Prompt for GENERATING new questions based on the file content.
-        Used by the generate_questionnaire view.
-        """
-
-        type_descriptions = {
-            'multiple_choice': 'Multiple Choice (4 options A, B, C, D)',
-            'true_false':      'True/False',
-            'identification':  'Identification (short answer)',
-            'essay':           'Essay (detailed answer)',
-            'fill_blank':      'Fill in the Blank',
-            'matching':        'Matching Type',
-        }
-
-        types_list = '\n'.join([
-            f"- {type_descriptions.get(t, t)}" for t in type_names
-        ])
-
-        prompt = f"""You are an expert teacher. Based on the educational content below, generate high-quality exam questions.
+_GENERATION_PROMPT_TEMPLATE = """You are an expert teacher. Based on the educational content below, generate high-quality exam questions.
 
 QUESTION TYPES TO GENERATE:
 {types_list}
@@ -924,126 +1656,3 @@ INSTRUCTIONS:
 4. Return ONLY a valid JSON array, no extra text
 
 JSON:"""
-
-        return prompt
-
-    def _parse_ai_response(self, response_text: str) -> List[Dict[str, Any]]:
-        """Parse Claude's JSON response into a list of question dicts."""
-
-        response_text = response_text.strip()
-
-        # Remove markdown code blocks if present
-        if '```json' in response_text:
-            match = re.search(r'```json\s*\n(.*?)\n```', response_text, re.DOTALL)
-            if match:
-                response_text = match.group(1).strip()
-        elif '```' in response_text:
-            response_text = re.sub(r'^```\s*\n', '', response_text)
-            response_text = re.sub(r'\n```\s*$', '', response_text)
-            response_text = response_text.strip()
-
-        # Find JSON array if response has extra text around it
-        if not response_text.startswith('['):
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
-
-        try:
-            questions = json.loads(response_text)
-
-            if not isinstance(questions, list):
-                return []
-
-            validated = []
-            for i, q in enumerate(questions):
-                try:
-                    if self._validate_question(q):
-                        validated.append(q)
-                    else:
-                        logger.debug("Skipping question %d — failed validation", i + 1)
-                except Exception as e:
-                    logger.warning("Error validating question %d: %s", i + 1, e)
-                    continue
-
-            logger.debug("Found %d valid questions in AI response", len(validated))
-            return validated
-
-        except json.JSONDecodeError as e:
-            logger.error("Failed to parse AI response: %s\nPreview: %s", e, response_text[:500])
-
-            # Try to recover individual objects from a malformed response.
-            # The pattern handles one level of nesting (needed for matching pairs
-            # which contain inner {…} objects inside the matching_pairs array).
-            try:
-                objects = re.findall(
-                    r'\{(?:[^{}]|\{[^{}]*\})*\}',
-                    response_text,
-                    re.DOTALL,
-                )
-                recovered = []
-                for obj_str in objects:
-                    try:
-                        q = json.loads(obj_str)
-                        if self._validate_question(q):
-                            recovered.append(q)
-                    except (ValueError, json.JSONDecodeError):
-                        continue
-                if recovered:
-                    logger.warning("Recovered %d questions from malformed response", len(recovered))
-                    return recovered
-            except Exception as recover_err:
-                logger.error("Recovery attempt failed: %s", recover_err)
-
-            raise ValueError(f"Could not parse AI response: {str(e)}") from e
-
-    def _validate_question(self, question: Dict[str, Any]) -> bool:
-        """Validate a question has the minimum required fields"""
-
-        # Must have type and question text at minimum
-        if not question.get('type') or not question.get('question'):
-            return False
-
-        q_type = question['type']
-
-        # Section headers are always valid — no further checks needed
-        if q_type == 'section_header':
-            question.setdefault('answer', '')
-            question.setdefault('explanation', '')
-            question.setdefault('difficulty', 'easy')
-            question.setdefault('points', 0)
-            return True
-
-        # Multiple choice must have all 4 options
-        if q_type == 'multiple_choice':
-            for option in ['option_a', 'option_b', 'option_c', 'option_d']:
-                if not question.get(option):
-                    return False
-
-        # Matching: ensure default arrays — do NOT silently drop the question
-        if q_type == 'matching':
-            if 'column_a' not in question or question.get('column_a') is None:
-                question['column_a'] = []
-            if 'column_b' not in question or question.get('column_b') is None:
-                question['column_b'] = []
-            if 'matching_pairs' not in question or question.get('matching_pairs') is None:
-                question['matching_pairs'] = []
-
-        # Set defaults for optional fields
-        if question.get('difficulty') not in ['easy', 'medium', 'hard']:
-            question['difficulty'] = 'medium'
-
-        if not question.get('points'):
-            question['points'] = 1
-
-        if 'explanation' not in question:
-            question['explanation'] = ''
-
-        if 'answer' not in question:
-            question['answer'] = ''
-
-        return True
-
-
-def get_extractor():
-    """Factory function to get an extractor instance"""
-    return AIQuestionExtractor()
\ No newline at end of file
@@ -2,13 +2,16 @@
 # FILE: questionnaires/forms.py
 # ============================================================================
 
+import os
+
 from django import forms
 from .models import Questionnaire, QuestionType
 from accounts.models import Department, Subject
 
 
 class QuestionnaireUploadForm(forms.ModelForm):
-    ALLOWED_EXTENSIONS = ['pdf', 'docx', 'doc', 'xlsx', 'xls', 'txt']
+    ALLOWED_EXTENSIONS     = ('pdf', 'docx', 'doc', 'xlsx', 'xls', 'txt')  # display order
+    _ALLOWED_EXTENSION_SET = frozenset(ALLOWED_EXTENSIONS)
 
     subject = forms.ModelChoiceField(
         queryset=Subject.objects.none(),
@@ -82,17 +85,23 @@ class QuestionnaireUploadForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
+        # Callers that already know which subjects to offer pass them in,
+        # which skips the assigned-subjects lookup below.
+        subject_queryset = kwargs.pop('subject_queryset', None)
         super().__init__(*args, **kwargs)
 
-        if self.user and hasattr(self.user, 'teacher_profile'):
+        if subject_queryset is not None:
+            self.fields['subject'].queryset = subject_queryset
+        elif self.user and hasattr(self.user, 'teacher_profile'):
             teacher  = self.user.teacher_profile
-            assigned = teacher.subjects.all()
+            # Only what the dropdown renders (Subject.__str__ = code + name)
+            assigned = teacher.subjects.only('id', 'code', 'name')
             if assigned.exists():
                 self.fields['subject'].queryset = assigned
             else:
                 self.fields['subject'].queryset = Subject.objects.filter(
                     departments=teacher.department
-                )
+                ).only('id', 'code', 'name')
 
     def clean_exam_type(self):
         value = self.cleaned_data.get('exam_type')
@@ -127,8 +136,10 @@ class QuestionnaireUploadForm(forms.ModelForm):
     def clean_file(self):
         file = self.cleaned_data.get('file')
         if file:
-            ext = file.name.split('.')[-1].lower()
-            if ext not in self.ALLOWED_EXTENSIONS:
+            # Same rule as Questionnaire.get_file_extension — a name with no
+            # dot yields '' rather than the whole name.
+            ext = os.path.splitext(file.name)[1][1:].lower()
+            if ext not in self._ALLOWED_EXTENSION_SET:
                 raise forms.ValidationError(
                     f'File type not allowed. Allowed types: {", ".join(self.ALLOWED_EXTENSIONS)}'
                 )
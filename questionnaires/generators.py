@@ -4,13 +4,21 @@
 # ============================================================================
 
 from docx import Document
-from docx.shared import Pt, Inches, RGBColor
+from docx.shared import Emu, Pt, Inches, RGBColor
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK, WD_LINE_SPACING
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml import OxmlElement, parse_xml
+import copy
+import functools
 import io
+import logging
 import os
 import re
+from operator import attrgetter
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
 
 # ── Template path ─────────────────────────────────────────────────────────
 # Built from this file's own location so it works no matter what the
@@ -21,17 +29,103 @@ TEMPLATE_PATH = os.path.join(BASE_DIR, "bisu_template.docx")
 # ── Shared document formatting constants ─────────────────────────────────────
 FONT_NAME = 'Arial Narrow'
 FONT_SIZE = Pt(12)
+RUN_STYLE_NAME = 'BISU Body'
+
+# Fills {{DIRECTIONS}} when the questionnaire data carries no directions.
+DEFAULT_DIRECTIONS = (
+    "Write all your answers and solutions directly on the test questionnaire. "
+    "Make sure your responses are well-organized and written clearly and legibly. "
+    "After three (3) warnings, students caught discussing during the exam will be "
+    "asked to IMMEDIATELY SURRENDER their test questionnaires. If you have any "
+    "questions during the exam, feel free to ask the instructor for assistance. "
+    "Wishing you all the best of luck on your exam!"
+)
+
+# Anything but str.isalnum() characters, '_' and '-' is dropped from download
+# filenames (\w is exactly isalnum() plus '_').
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w-]+')
+
+# ── Spacer paragraph ─────────────────────────────────────────────────────────
+# Empty paragraph with the same pPr _fmt_para() applies; deep-copied for each
+# blank line instead of going through add_paragraph() + paragraph_format.
+_SPACER_P = parse_xml(
+    '<w:p %s><w:pPr>'
+    '<w:spacing w:line="240" w:lineRule="auto" w:before="0" w:after="0"/>'
+    '</w:pPr></w:p>' % nsdecls('w')
+)
+
+# ── Plain text paragraph ─────────────────────────────────────────────────────
+_TEXT_P_TEMPLATE = (
+    '<w:p {nsdecls}>'
+    '<w:pPr><w:spacing w:line="240" w:lineRule="auto" w:before="0" w:after="0"/></w:pPr>'
+    '<w:r><w:rPr><w:rStyle w:val="{style_id}"/></w:rPr>{text}</w:r>'
+    '</w:p>'
+)
+
+# ── Multiple-choice options table ────────────────────────────────────────────
+# Same markup python-docx's add_table() produces for a 2×2 table, with each
+# cell already holding its formatted paragraph and run.
+_OPTIONS_TBL_TEMPLATE = (
+    '<w:tbl {nsdecls}>'
+    '<w:tblPr>'
+    '<w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0"'
+    ' w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+    '</w:tblPr>'
+    '<w:tblGrid><w:gridCol w:w="{col_w}"/><w:gridCol w:w="{col_w}"/></w:tblGrid>'
+    '<w:tr>{a}{b}</w:tr>'
+    '<w:tr>{c}{d}</w:tr>'
+    '</w:tbl>'
+)
+_OPTION_CELL_TEMPLATE = (
+    '<w:tc>'
+    '<w:tcPr><w:tcW w:type="dxa" w:w="{col_w}"/></w:tcPr>'
+    '<w:p>'
+    '<w:pPr><w:spacing w:line="240" w:lineRule="auto" w:before="0" w:after="0"/></w:pPr>'
+    '<w:r><w:rPr><w:rStyle w:val="{style_id}"/></w:rPr>{text}</w:r>'
+    '</w:p>'
+    '</w:tc>'
+)
+_RUN_TEXT_SPLIT = re.compile(r'([\t\n\r])')
+
+
+def _run_text_xml(text):
+    """Return the <w:t>/<w:tab/>/<w:br/> markup that Run.text would produce for text."""
+    parts = []
+    for chunk in _RUN_TEXT_SPLIT.split(text):
+        if chunk == '\t':
+            parts.append('<w:tab/>')
+        elif chunk in ('\n', '\r'):
+            parts.append('<w:br/>')
+        elif chunk:
+            space = ' xml:space="preserve"' if len(chunk.strip()) < len(chunk) else ''
+            parts.append(f'<w:t{space}>{escape(chunk)}</w:t>')
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=4)
+def _template_bytes(path):
+    """
+    Raw bytes of the .docx template at path, or None if it does not exist.
+    Read from disk once per process; each generator parses its own copy.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
 
 
 class BISUQuestionnaireGenerator:
 
     def __init__(self, template_path=None):
         path = template_path or TEMPLATE_PATH
-        if os.path.exists(path):
-            self.doc = Document(path)
-            print(f"✅ Loaded template: {path}")
+        template_bytes = _template_bytes(path)
+        if template_bytes is not None:
+            self.doc = Document(io.BytesIO(template_bytes))
+            logger.debug("Loaded template: %s", path)
         else:
-            print(f"⚠️  Template not found at: {path}")
+            logger.warning("Template not found at: %s", path)
             self.doc = Document()
             self._setup_page_margins()
 
@@ -45,7 +139,8 @@ class BISUQuestionnaireGenerator:
     # =========================================================================
 
     def _setup_default_style(self):
-        """Set Normal style to Arial Narrow 12pt, single line spacing, 0pt space before/after."""
+        """Set Normal style to Arial Narrow 12pt, single line spacing, 0pt space before/after,
+        and register the character style shared by every generated run."""
         style = self.doc.styles['Normal']
         style.font.name = FONT_NAME
         style.font.size = FONT_SIZE
@@ -54,6 +149,16 @@ class BISUQuestionnaireGenerator:
         pf.space_before = Pt(0)
         pf.space_after  = Pt(0)
 
+        # Runs reference one character style instead of each carrying its own
+        # rFonts/sz elements — a single rStyle child per run.
+        try:
+            run_style = self.doc.styles[RUN_STYLE_NAME]
+        except KeyError:
+            run_style = self.doc.styles.add_style(RUN_STYLE_NAME, WD_STYLE_TYPE.CHARACTER)
+            run_style.font.name = FONT_NAME
+            run_style.font.size = FONT_SIZE
+        self._run_style_id = run_style.style_id
+
     @staticmethod
     def _fmt_para(p):
         """Apply single line spacing and 0pt before/after to a paragraph."""
@@ -62,11 +167,25 @@ class BISUQuestionnaireGenerator:
         pf.space_before = Pt(0)
         pf.space_after  = Pt(0)
 
-    @staticmethod
-    def _fmt_run(r):
-        """Apply Arial Narrow 12pt to a run."""
-        r.font.name = FONT_NAME
-        r.font.size = FONT_SIZE
+    def _fmt_run(self, r):
+        """Apply Arial Narrow 12pt to a run via the shared character style."""
+        r._r.style = self._run_style_id
+
+    def _add_text_paragraph(self, text):
+        """
+        Append a plain body paragraph (single-spaced, body run style) parsed
+        from one XML template — same markup as add_paragraph() + add_run()
+        with _fmt_para/_fmt_run, without building the wrapper objects.
+        """
+        self.doc.element.body._insert_p(parse_xml(_TEXT_P_TEMPLATE.format(
+            nsdecls=nsdecls('w'),
+            style_id=self._run_style_id,
+            text=_run_text_xml(text),
+        )))
+
+    def _add_spacer(self):
+        """Append an empty single-spaced paragraph used as vertical space."""
+        self.doc.element.body._insert_p(copy.deepcopy(_SPACER_P))
 
     def _setup_page_margins(self):
         section = self.doc.sections[0]
@@ -100,7 +219,7 @@ class BISUQuestionnaireGenerator:
             '{{INSTRUCTOR}}':  data.get('instructor', ''),
             '{{DEPARTMENT}}':  data.get('department', ''),
             '{{SEMESTER}}':    data.get('semester', ''),
-            '{{DIRECTIONS}}':  data.get('general_directions', self._get_default_directions()),
+            '{{DIRECTIONS}}':  data.get('general_directions', DEFAULT_DIRECTIONS),
         }
 
         for paragraph in self.doc.paragraphs:
@@ -129,9 +248,15 @@ class BISUQuestionnaireGenerator:
                                 self._replace_all(paragraph, replacements)
 
     def _replace_all(self, paragraph, replacements):
+        # paragraph.text re-joins every run, so read it once and only again
+        # after a replacement actually changed the paragraph.
+        text = paragraph.text
+        if '{{' not in text:
+            return
         for placeholder, value in replacements.items():
-            if placeholder in paragraph.text:
+            if placeholder in text:
                 self._replace_in_paragraph(paragraph, placeholder, value)
+                text = paragraph.text
 
     PLACEHOLDER_STYLES = {
         '{{TITLE}}': {
@@ -169,16 +294,6 @@ class BISUQuestionnaireGenerator:
                 if 'underline'  in style: first_run.underline      = style['underline']
                 if 'color'      in style: first_run.font.color.rgb = style['color']
 
-    def _get_default_directions(self):
-        return (
-            "Write all your answers and solutions directly on the test questionnaire. "
-            "Make sure your responses are well-organized and written clearly and legibly. "
-            "After three (3) warnings, students caught discussing during the exam will be "
-            "asked to IMMEDIATELY SURRENDER their test questionnaires. If you have any "
-            "questions during the exam, feel free to ask the instructor for assistance. "
-            "Wishing you all the best of luck on your exam!"
-        )
-
     # =========================================================================
     # QUESTION SECTIONS
     # =========================================================================
@@ -236,8 +351,7 @@ class BISUQuestionnaireGenerator:
                     self._fmt_run(r2)
                     r2.italic = True
 
-                sp = self.doc.add_paragraph()
-                self._fmt_para(sp)
+                self._add_spacer()
 
             if not questions:
                 continue
@@ -270,8 +384,7 @@ class BISUQuestionnaireGenerator:
                     'answers': section_answers,
                 }
 
-            sp = self.doc.add_paragraph()
-            self._fmt_para(sp)
+            self._add_spacer()
 
         return answer_key
 
@@ -293,8 +406,7 @@ class BISUQuestionnaireGenerator:
             r2 = p.add_run(f" {section_data['instruction']}")
             self._fmt_run(r2)
 
-            sp = self.doc.add_paragraph()
-            self._fmt_para(sp)
+            self._add_spacer()
 
             section_answers = []
             for question in section_data['questions']:
@@ -317,8 +429,7 @@ class BISUQuestionnaireGenerator:
                     'answers': section_answers,
                 }
 
-            sp = self.doc.add_paragraph()
-            self._fmt_para(sp)
+            self._add_spacer()
 
         return answer_key
 
@@ -342,19 +453,13 @@ class BISUQuestionnaireGenerator:
             else:
                 stem = question.question_text
 
-        p = self.doc.add_paragraph()
-        self._fmt_para(p)
-        r = p.add_run(stem)
-        self._fmt_run(r)
+        self._add_text_paragraph(stem)
 
         if qtype == 'multiple_choice':
             self._add_multiple_choice(question)
 
         elif qtype in ('identification', 'fill_blank', 'fill_in_the_blank'):
-            p2 = self.doc.add_paragraph()
-            self._fmt_para(p2)
-            r2 = p2.add_run("Answer: ________________________")
-            self._fmt_run(r2)
+            self._add_text_paragraph("Answer: ________________________")
 
         elif qtype == 'enumeration':
             raw = question.correct_answer or ''
@@ -363,17 +468,11 @@ class BISUQuestionnaireGenerator:
                 items = [s.strip() for s in raw.split(',') if s.strip()]
             num_lines = max(len(items), 3)
             for idx in range(num_lines):
-                p2 = self.doc.add_paragraph()
-                self._fmt_para(p2)
-                r2 = p2.add_run(f"{idx + 1}. ________________________")
-                self._fmt_run(r2)
+                self._add_text_paragraph(f"{idx + 1}. ________________________")
 
         elif qtype == 'essay':
             for _ in range(4):
-                p2 = self.doc.add_paragraph()
-                self._fmt_para(p2)
-                r2 = p2.add_run("_" * 80)
-                self._fmt_run(r2)
+                self._add_text_paragraph("_" * 80)
 
     # =========================================================================
     # MULTIPLE CHOICE
@@ -386,15 +485,30 @@ class BISUQuestionnaireGenerator:
             ('c', question.option_c),
             ('d', question.option_d),
         ]
-        table = self.doc.add_table(rows=2, cols=2)
-        for i, (letter, text) in enumerate(opts):
-            cell = table.rows[i // 2].cells[i % 2]
-            p = cell.paragraphs[0]
-            self._fmt_para(p)
-            r = p.add_run(f"{letter}. {text or ''}")
-            self._fmt_run(r)
-        sp = self.doc.add_paragraph()
-        self._fmt_para(sp)
+        # No options were captured — an empty a./b./c./d. grid is just noise.
+        if not any(text for _, text in opts):
+            return
+
+        # Build the whole 2×2 table as one XML string and parse it once,
+        # rather than going through add_table() and four _Cell wrappers.
+        section   = self.doc.sections[-1]
+        content_w = section.page_width - section.left_margin - section.right_margin
+        col_w     = Emu(content_w // 2).twips
+
+        a, b, c, d = (
+            _OPTION_CELL_TEMPLATE.format(
+                col_w=col_w,
+                style_id=self._run_style_id,
+                text=_run_text_xml(f"{letter}. {text or ''}"),
+            )
+            for letter, text in opts
+        )
+        tbl = parse_xml(_OPTIONS_TBL_TEMPLATE.format(
+            nsdecls=nsdecls('w'), col_w=col_w, a=a, b=b, c=c, d=d,
+        ))
+        self.doc.element.body._insert_tbl(tbl)
+
+        self._add_spacer()
 
     # =========================================================================
     # MATCHING TYPE
@@ -412,8 +526,7 @@ class BISUQuestionnaireGenerator:
             )
             self._fmt_run(r)
             r.italic = True
-            sp = self.doc.add_paragraph()
-            self._fmt_para(sp)
+            self._add_spacer()
             return
 
         column_a = md['column_a']
@@ -498,8 +611,7 @@ class BISUQuestionnaireGenerator:
             r = p.add_run(b_text)
             self._fmt_run(r)
 
-        sp = self.doc.add_paragraph()
-        self._fmt_para(sp)
+        self._add_spacer()
 
     # =========================================================================
     # TABLE HELPERS
@@ -508,17 +620,14 @@ class BISUQuestionnaireGenerator:
     @staticmethod
     def _set_col_widths(table, widths_dxa):
         """Set individual column widths (DXA) on every cell in each column."""
-        for ci, width in enumerate(widths_dxa):
-            for cell in table.columns[ci].cells:
-                tc   = cell._tc
-                tcPr = tc.get_or_add_tcPr()
-                tcW  = OxmlElement('w:tcW')
+        # Walk the w:tr/w:tc elements directly and update the tcW that
+        # add_table() already created, instead of building the _Cell grid
+        # through table.columns and replacing each tcW with a new element.
+        for tr in table._tbl.tr_lst:
+            for tc, width in zip(tr.tc_lst, widths_dxa):
+                tcW = tc.get_or_add_tcPr().get_or_add_tcW()
                 tcW.set(qn('w:w'),    str(width))
                 tcW.set(qn('w:type'), 'dxa')
-                existing = tcPr.find(qn('w:tcW'))
-                if existing is not None:
-                    tcPr.remove(existing)
-                tcPr.append(tcW)
 
     @staticmethod
     def _set_table_borders_invisible(tblPr):
@@ -579,8 +688,7 @@ class BISUQuestionnaireGenerator:
 
         self._add_horizontal_rule()
 
-        sp = self.doc.add_paragraph()
-        self._fmt_para(sp)
+        self._add_spacer()
 
         # Answers grouped by section
         for section_key, section_data in answer_key_data.items():
@@ -614,10 +722,7 @@ class BISUQuestionnaireGenerator:
                         match = pair.get('match', '?')
                         n     = item.split('.')[0].strip() if '.' in str(item) else str(item)
                         parts.append(f"{n}→{match}")
-                    p = self.doc.add_paragraph()
-                    self._fmt_para(p)
-                    r = p.add_run('   '.join(parts))
-                    self._fmt_run(r)
+                    self._add_text_paragraph('   '.join(parts))
 
             if enumeration_answers:
                 for num, answer in enumeration_answers:
@@ -630,10 +735,7 @@ class BISUQuestionnaireGenerator:
                     if len(raw_items) <= 1:
                         raw_items = [s.strip() for s in answer.split(',') if s.strip()]
                     for i, item in enumerate(raw_items, 1):
-                        p = self.doc.add_paragraph()
-                        self._fmt_para(p)
-                        r = p.add_run(f"     {i}. {item}")
-                        self._fmt_run(r)
+                        self._add_text_paragraph(f"     {i}. {item}")
 
             if regular_answers:
                 cols = 5
@@ -656,8 +758,7 @@ class BISUQuestionnaireGenerator:
                     r     = p.add_run(f"{num}. {answer}")
                     self._fmt_run(r)
 
-            sp = self.doc.add_paragraph()
-            self._fmt_para(sp)
+            self._add_spacer()
 
     def _add_horizontal_rule(self):
         p = self.doc.add_paragraph()
@@ -670,10 +771,18 @@ class BISUQuestionnaireGenerator:
     # SAVE — IN MEMORY ONLY (no local disk writes; safe on Vercel)
     # =========================================================================
 
+    def save(self, target):
+        """
+        Write the generated document straight into target and return it.
+        target may be a path or any writable file-like object — including a
+        Django HttpResponse, which avoids building a separate buffer first.
+        """
+        self.doc.save(target)
+        return target
+
     def save_to_buffer(self):
         """Return the generated document as an in-memory BytesIO buffer."""
-        buffer = io.BytesIO()
-        self.doc.save(buffer)
+        buffer = self.save(io.BytesIO())
         buffer.seek(0)
         return buffer
 
@@ -682,12 +791,14 @@ class BISUQuestionnaireGenerator:
 # MAIN ENTRY POINT
 # =============================================================================
 
-def generate_bisu_questionnaire(questionnaire_obj, selected_questions):
+def generate_bisu_questionnaire(questionnaire_obj, selected_questions, target=None):
     """
     Generate a BISU questionnaire from database objects using the Word template.
 
     Returns: (buffer, filename)
-        buffer   — io.BytesIO containing the .docx file, ready to stream
+        buffer   — io.BytesIO containing the .docx file, ready to stream, or
+                   target itself when one is given (e.g. an HttpResponse the
+                   document is written into directly)
         filename — suggested download filename
 
     NOTE: PDF output has been removed. docx2pdf requires a real installation
@@ -697,6 +808,10 @@ def generate_bisu_questionnaire(questionnaire_obj, selected_questions):
     service (e.g. Gotenberg, CloudConvert, Adobe PDF Services API) and call
     it here with the docx bytes from save_to_buffer().
     """
+    # Every renderer branches on question.question_type.name; make sure a
+    # queryset brings the type along instead of one query per question.
+    if hasattr(selected_questions, 'select_related'):
+        selected_questions = selected_questions.select_related('question_type')
     selected_list = list(selected_questions)
     selected_ids  = {q.id for q in selected_list}
 
@@ -713,7 +828,7 @@ def generate_bisu_questionnaire(questionnaire_obj, selected_questions):
     if section_headers:
         all_questions = sorted(
             selected_list + section_headers,
-            key=lambda q: q.created_at,
+            key=attrgetter('created_at'),
         )
     else:
         all_questions = selected_list
@@ -721,13 +836,16 @@ def generate_bisu_questionnaire(questionnaire_obj, selected_questions):
     sections = []
     current_header = None
     current_questions = []
+    type_name = attrgetter('question_type.name')
 
+    # current_questions is rebound for every new section, so each section
+    # can keep the list itself rather than a copy of it.
     for q in all_questions:
-        if q.question_type.name == 'section_header':
+        if type_name(q) == 'section_header':
             if current_questions or current_header is not None:
                 sections.append({
                     'header':    current_header,
-                    'questions': current_questions[:],
+                    'questions': current_questions,
                 })
             current_header    = q.question_text
             current_questions = []
@@ -737,7 +855,7 @@ def generate_bisu_questionnaire(questionnaire_obj, selected_questions):
     if current_questions or current_header is not None:
         sections.append({
             'header':    current_header,
-            'questions': current_questions[:],
+            'questions': current_questions,
         })
 
     if not sections:
@@ -764,8 +882,11 @@ def generate_bisu_questionnaire(questionnaire_obj, selected_questions):
     generator.generate_questionnaire(questionnaire_data)
 
     safe_name = f"{questionnaire_obj.subject.code}_{questionnaire_obj.title}".replace(' ', '_')
-    safe_name = "".join(c for c in safe_name if c.isalnum() or c in ('_', '-'))
+    safe_name = _UNSAFE_FILENAME_CHARS.sub('', safe_name)
     filename  = f"{safe_name}.docx"
 
+    if target is not None:
+        return generator.save(target), filename
+
     buffer = generator.save_to_buffer()
-    return buffer, filename
\ No newline at end of file
+    return buffer, filename
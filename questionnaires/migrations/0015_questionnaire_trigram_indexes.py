@@ -0,0 +1,24 @@
+# Generated by Django 5.2.16 on 2026-10-15 22:50
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_subject_trigram_indexes'),
+        ('questionnaires', '0014_alter_questionnaire_sub_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='questionnaire',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='q_title_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='questionnaire',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='q_description_trgm'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.16 on 2026-10-15 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_subject_trigram_indexes'),
+        ('questionnaires', '0015_questionnaire_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='questionnaire',
+            index=models.Index(fields=['uploader', '-uploaded_at'], name='q_uploader_ts_idx'),
+        ),
+    ]
@@ -3,11 +3,17 @@
 # ============================================================================
 
 from django.db import models, migrations
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from accounts.models import TeacherProfile, Department, Subject
 from django.contrib.auth.models import User
 import os
+import re
+import logging
 import json as _json
 
+logger = logging.getLogger(__name__)
+
 
 def questionnaire_upload_path(instance, filename):
     return f'questionnaires/{instance.department.code}/{instance.subject.code}/{filename}'
@@ -124,6 +130,14 @@ class Questionnaire(models.Model):
 
     class Meta:
         ordering = ['-uploaded_at']
+        # Trigram indexes on UPPER(col) — the expression icontains compiles
+        # to on PostgreSQL — so the '%term%' searches can use an index.
+        indexes = [
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'),       name='q_title_trgm'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='q_description_trgm'),
+            # my_uploads: one teacher's rows, already in -uploaded_at order
+            models.Index(fields=['uploader', '-uploaded_at'], name='q_uploader_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.subject.code}"
@@ -131,16 +145,19 @@ class Questionnaire(models.Model):
     def get_file_extension(self):
         return os.path.splitext(self.file.name)[1][1:].lower()
 
+    _SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
     def get_file_size_display(self):
-        size = self.file_size
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.2f} {unit}"
-            size /= 1024.0
-        return f"{size:.2f} TB"
+        size = self.file_size or 0
+        # Each unit is 2**10 of the previous one, so the bit length picks it.
+        unit_idx = min((size.bit_length() - 1) // 10, 4) if size > 0 else 0
+        return f"{size / (1 << (unit_idx * 10)):.2f} {self._SIZE_UNITS[unit_idx]}"
 
     def save(self, *args, **kwargs):
-        if self.file:
+        # Size and type only change with the file itself. On a stored file,
+        # FieldFile.size is a storage round-trip (a HEAD request on S3), so
+        # ordinary updates such as status changes skip it.
+        if self.file and (self._state.adding or not self.file._committed):
             self.file_size = self.file.size
             self.file_type = self.get_file_extension()
         super().save(*args, **kwargs)
@@ -176,6 +193,39 @@ class QuestionType(models.Model):
         ordering = ['name']
 
 
+# Largest value PostgreSQL's integer column (ExtractedQuestion.points) holds
+MAX_QUESTION_POINTS = 2**31 - 1
+
+# Values allowed in ExtractedQuestion.difficulty
+EXTRACTED_DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+# Leading number of a loosely formatted points value ("2", "2.0", "2 pts")
+_LEADING_NUMBER_RE = re.compile(r'\s*(\d+(?:\.\d+)?)')
+
+
+def parse_points(value):
+    """
+    Whole points from a loosely formatted value — 3, 1.5, "2.0", "2 pts" —
+    by keeping its leading number. None when there isn't one.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    match = _LEADING_NUMBER_RE.match(str(value))
+    return int(float(match.group(1))) if match else None
+
+
+def _storable_text(value):
+    """value as text PostgreSQL accepts (no NUL bytes); None stays None."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    return value.replace('\x00', '')
+
+
 class ExtractedQuestion(models.Model):
     questionnaire = models.ForeignKey(
         Questionnaire,
@@ -219,6 +269,64 @@ class ExtractedQuestion(models.Model):
     def __str__(self):
         return f"{self.question_type} - {self.question_text[:50]}"
 
+    @classmethod
+    def attach_counts(cls, questionnaires):
+        """
+        Set `question_count` on each questionnaire with one grouped query.
+        Meant for a page of results: rendering
+        questionnaire.extracted_questions.count per card ran a COUNT per row.
+        """
+        questionnaires = list(questionnaires)
+        counts = dict(
+            cls.objects.filter(questionnaire__in=questionnaires)
+            .order_by().values('questionnaire')
+            .annotate(n=models.Count('pk'))
+            .values_list('questionnaire', 'n')
+        )
+        for questionnaire in questionnaires:
+            questionnaire.question_count = counts.get(questionnaire.pk, 0)
+
+    @classmethod
+    def storable(cls, questions):
+        """
+        Coerce unsaved questions so they can share one bulk_create, dropping
+        any that still can't be stored. A single bad row (points like
+        "2 pts", an over-long difficulty, a NUL byte in the text) would
+        otherwise fail the whole INSERT and lose every question in it.
+        """
+        valid = []
+        for question in questions:
+            try:
+                question._coerce_for_insert()
+            except ValueError as exc:
+                logger.warning("Dropping question that cannot be stored: %s", exc)
+                continue
+            valid.append(question)
+        return valid
+
+    def _coerce_for_insert(self):
+        """Normalise field values in place; ValueError if the row is unusable."""
+        if self.questionnaire_id is None or self.question_type_id is None:
+            raise ValueError('missing questionnaire or question type')
+
+        self.question_text = _storable_text(self.question_text) or ''
+        if not self.question_text.strip():
+            raise ValueError('empty question text')
+
+        # NOT NULL column
+        self.correct_answer = _storable_text(self.correct_answer) or ''
+        self.explanation    = _storable_text(self.explanation)
+        self.option_a       = _storable_text(self.option_a)
+        self.option_b       = _storable_text(self.option_b)
+        self.option_c       = _storable_text(self.option_c)
+        self.option_d       = _storable_text(self.option_d)
+
+        difficulty      = str(self.difficulty or '').strip().lower()
+        self.difficulty = difficulty if difficulty in EXTRACTED_DIFFICULTIES else 'medium'
+
+        points      = parse_points(self.points)
+        self.points = points if points is not None and 0 <= points <= MAX_QUESTION_POINTS else 1
+
     # ── Type checks ───────────────────────────────────────────────────────────
 
     @property
@@ -258,8 +366,6 @@ class ExtractedQuestion(models.Model):
         if not self.is_matching:
             return None
 
-        import logging
-        logger = logging.getLogger(__name__)
         logger.debug(
             "get_matching_data id=%s option_a=%r option_b=%r option_c=%r",
             self.pk, self.option_a, self.option_b, self.option_c,
@@ -428,6 +534,30 @@ class WorkspaceFolderQuestion(models.Model):
     def __str__(self):
         return f"{self.folder.name} → Q#{self.question.pk}"
 
+    @classmethod
+    def add_many(cls, folder, question_ids):
+        """
+        Add the given questions to folder with batched INSERTs instead of one
+        get_or_create() per question. Ids that match no question are skipped.
+        Returns (added, already_present); input order is kept for added_at.
+        """
+        question_ids = list(dict.fromkeys(int(qid) for qid in question_ids))
+        known = set(
+            ExtractedQuestion.objects.filter(pk__in=question_ids)
+            .values_list('pk', flat=True)
+        )
+        existing = set(
+            cls.objects.filter(folder=folder, question_id__in=known)
+            .values_list('question_id', flat=True)
+        )
+        new_ids = [qid for qid in question_ids if qid in known and qid not in existing]
+        cls.objects.bulk_create(
+            [cls(folder=folder, question_id=qid) for qid in new_ids],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        return len(new_ids), len(existing)
+
 
 # ============================================================================
 # DATA MIGRATION HELPER
@@ -0,0 +1,77 @@
+# ============================================================================
+# FILE: questionnaires/pagination.py
+# ============================================================================
+# These caches are EVENTUALLY CONSISTENT. The configured cache is a
+# per-process LocMemCache, so a save/delete in one worker cannot invalidate
+# what another worker holds, and queryset.update()/bulk_create() never run
+# save() at all. Entries therefore expire on a short TTL instead of being
+# busted: a new or deleted questionnaire can take up to that long to show in
+# a list's total or page layout on a given worker.
+
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+# Seconds a list's COUNT(*) is reused while paging through it
+COUNT_CACHE_TIMEOUT = 30
+
+# Seconds the primary keys on one page of a list are reused
+PAGE_CACHE_TIMEOUT = 30
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that caches the queryset's total, keyed on its SQL, so pages
+    2..N of the same filtered list reuse page 1's COUNT(*) instead of
+    re-running the aggregate on every request. The total may lag recent
+    uploads/deletes by up to COUNT_CACHE_TIMEOUT seconds.
+    """
+
+    @cached_property
+    def _query_key(self):
+        """SQL digest of object_list; None if it can't match anything."""
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        return hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+
+    @cached_property
+    def count(self):
+        if self._query_key is None:
+            return 0
+
+        key   = f'qcount:{self._query_key}'
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CachedPagePaginator(CachedCountPaginator):
+    """
+    Also remembers which rows each page held. A repeat visit to a hot
+    search/filter page then fetches those rows by primary key rather than
+    re-running the filtered, sorted scan with its OFFSET. The cached keys are
+    re-checked against the live queryset, so a row that was deleted or
+    stopped matching drops out; new rows appear once the entry expires.
+    """
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self._query_key is None:
+            return super().page(number)
+
+        key = f'qpage:{self._query_key}:{self.per_page}:{number}'
+        pks = cache.get(key)
+        if pks is None:
+            page = super().page(number)
+            cache.set(key, [obj.pk for obj in page.object_list], PAGE_CACHE_TIMEOUT)
+            return page
+
+        by_pk = {obj.pk: obj for obj in self.object_list.filter(pk__in=pks)}
+        return self._get_page([by_pk[pk] for pk in pks if pk in by_pk], number, self)
@@ -4,11 +4,46 @@
 
 import io
 import json
-import PyPDF2
-import docx
-import openpyxl
+import logging
+import zipfile
 from typing import List, Dict
 from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+try:
+    from lxml import etree
+    _LXML_AVAILABLE = True
+except ImportError:
+    _LXML_AVAILABLE = False
+
+try:
+    import fitz  # PyMuPDF — optional, C-backed and much faster than PyPDF2
+    _PYMUPDF_AVAILABLE = True
+except ImportError:
+    _PYMUPDF_AVAILABLE = False
+
+_W_NS = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+_W    = '{%s}' % _W_NS['w']
+
+
+# Characters of source text included in a prompt
+PROMPT_CONTENT_CHARS = 8000
+
+# Rows per INSERT when saving extracted questions
+BULK_CREATE_BATCH_SIZE = 500
+
+
+def _truncate_at_paragraph(content: str, limit: int) -> str:
+    """Cut content to at most `limit` chars, preferring the last blank-line
+    boundary so the prompt never ends halfway through a question."""
+    if len(content) <= limit:
+        return content
+    cut = content.rfind('\n\n', 0, limit)
+    if cut < limit * 5 // 6:  # no boundary near the limit — hard cut
+        cut = limit
+    return content[:cut] + "\n... (content truncated)"
 
 
 class QuestionnaireExtractor:
@@ -60,33 +95,85 @@ class QuestionnaireExtractor:
             raise ValueError(f"Unsupported file format: {extension}")
 
     def _extract_from_pdf(self, file_obj) -> str:
-        """Extract text from PDF (file-like object)."""
-        text = ""
+        """Extract text from PDF (file-like object).
+
+        Uses PyMuPDF when installed; falls back to PyPDF2 otherwise.
+        """
+        text = []
         try:
-            pdf_reader = PyPDF2.PdfReader(file_obj)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            if _PYMUPDF_AVAILABLE:
+                doc = fitz.open(stream=file_obj.read(), filetype="pdf")
+                try:
+                    for page in doc:
+                        text.append(page.get_text("text"))
+                finally:
+                    doc.close()
+            else:
+                import PyPDF2
+                pdf_reader = PyPDF2.PdfReader(file_obj)
+                for page in pdf_reader.pages:
+                    text.append(page.extract_text() or "")
         except Exception as e:
             raise Exception(f"Error extracting PDF: {str(e)}")
-        return text
+        return "\n".join(text) + "\n" if text else ""
 
     def _extract_from_docx(self, file_obj) -> str:
-        """Extract text from DOCX (file-like object)."""
+        """Extract text from DOCX (file-like object).
+
+        Reads word/document.xml directly with lxml; python-docx is the
+        fallback for packages the fast path can't handle.
+        """
+        if _LXML_AVAILABLE:
+            try:
+                return self._extract_from_docx_xml(file_obj)
+            except Exception:
+                file_obj.seek(0)
         try:
+            import docx
             doc = docx.Document(file_obj)
             return "\n".join([paragraph.text for paragraph in doc.paragraphs])
         except Exception as e:
             raise Exception(f"Error extracting DOCX: {str(e)}")
 
+    @staticmethod
+    def _extract_from_docx_xml(file_obj) -> str:
+        """Body paragraph text via XPath — same output as python-docx's paragraph.text."""
+        with zipfile.ZipFile(file_obj) as zf:
+            root = etree.fromstring(zf.read('word/document.xml'))
+
+        lines = []
+        for p in root.xpath('/w:document/w:body/w:p', namespaces=_W_NS):
+            parts = []
+            for node in p.xpath('./w:r/* | ./w:hyperlink/w:r/*', namespaces=_W_NS):
+                tag = node.tag
+                if tag == f'{_W}t':
+                    parts.append(node.text or '')
+                elif tag in (f'{_W}tab', f'{_W}ptab'):
+                    parts.append('\t')
+                elif tag == f'{_W}cr':
+                    parts.append('\n')
+                elif tag == f'{_W}br':
+                    # Page/column breaks carry no text in python-docx
+                    if node.get(f'{_W}type', 'textWrapping') == 'textWrapping':
+                        parts.append('\n')
+                elif tag == f'{_W}noBreakHyphen':
+                    parts.append('-')
+            lines.append(''.join(parts))
+        return "\n".join(lines)
+
     def _extract_from_excel(self, file_obj) -> str:
         """Extract text from Excel (file-like object)."""
         try:
-            workbook = openpyxl.load_workbook(file_obj)
-            text = ""
-            for sheet in workbook.worksheets:
-                for row in sheet.iter_rows(values_only=True):
-                    text += " ".join([str(cell) for cell in row if cell]) + "\n"
-            return text
+            import openpyxl
+            workbook = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+            try:
+                lines = []
+                for sheet in workbook.worksheets:
+                    for row in sheet.iter_rows(values_only=True):
+                        lines.append(" ".join([str(cell) for cell in row if cell]) + "\n")
+                return "".join(lines)
+            finally:
+                workbook.close()
         except Exception as e:
             raise Exception(f"Error extracting Excel: {str(e)}")
 
@@ -100,7 +187,7 @@ class QuestionnaireExtractor:
         prompt = f"""You are an educational content analyzer. Extract and generate questions from the following educational material.
 
 CONTENT:
-{content[:8000]}
+{_truncate_at_paragraph(content, PROMPT_CONTENT_CHARS)}
 
 TASK:
 Analyze this content and generate questions of the following types:
@@ -210,13 +297,27 @@ Ensure questions are:
         # Use AI to extract questions
         extracted_data = self.extract_questions_with_ai(content, question_types)
 
-        # Save extracted questions to database
-        created_questions = []
-        for q_data in extracted_data.get('questions', []):
+        # Save extracted questions to database — one SELECT for the types,
+        # then batched INSERTs instead of a get() + create() per question.
+        questions = extracted_data.get('questions', [])
+        type_map  = {
+            qt.name: qt
+            for qt in QuestionType.objects.filter(
+                name__in={
+                    q['type'] for q in questions
+                    if isinstance(q, dict) and isinstance(q.get('type'), str)
+                }
+            )
+        }
+
+        new_questions = []
+        for q_data in questions:
             try:
-                question_type = QuestionType.objects.get(name=q_data['type'])
+                question_type = type_map.get(q_data['type'])
+                if question_type is None or q_data['question'] is None:
+                    continue
 
-                question = ExtractedQuestion.objects.create(
+                new_questions.append(ExtractedQuestion(
                     questionnaire=questionnaire,
                     question_type=question_type,
                     question_text=q_data['question'],
@@ -224,16 +325,19 @@ Ensure questions are:
                     option_b=q_data.get('options', {}).get('b'),
                     option_c=q_data.get('options', {}).get('c'),
                     option_d=q_data.get('options', {}).get('d'),
-                    correct_answer=q_data['correct_answer'],
+                    # NOT NULL columns — a null here would fail the whole batch
+                    correct_answer=q_data['correct_answer'] or '',
                     explanation=q_data.get('explanation', ''),
-                    difficulty=q_data.get('difficulty', 'medium'),
-                    points=q_data.get('points', 1)
-                )
-                created_questions.append(question)
-            except QuestionType.DoesNotExist:
-                continue
+                    difficulty=q_data.get('difficulty') or 'medium',
+                    points=q_data.get('points') or 1
+                ))
             except Exception as e:
-                print(f"Error creating question: {str(e)}")
+                logger.error("Error preparing question: %s", e)
                 continue
 
-        return created_questions
\ No newline at end of file
+        # Coerce/drop bad rows first so one can't sink the whole batch
+        new_questions = ExtractedQuestion.storable(new_questions)
+        with transaction.atomic():
+            return ExtractedQuestion.objects.bulk_create(
+                new_questions, batch_size=BULK_CREATE_BATCH_SIZE,
+            )
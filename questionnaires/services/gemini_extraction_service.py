@@ -3,17 +3,102 @@
 # ============================================================================
 
 import json
+import logging
 import re
+import threading
 import time
-import PyPDF2
-import docx
-import openpyxl
-from typing import List, Dict
+from typing import List, Dict, Optional
 from django.conf import settings
+from django.db import transaction
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fitz  # PyMuPDF — optional, preserves colour cues and column order
+    _PYMUPDF_AVAILABLE = True
+except ImportError:
+    _PYMUPDF_AVAILABLE = False
+
+# WordprocessingML namespace, Clark notation — same as docx.oxml.ns.qn('w:…')
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
 
 # Transient HTTP codes worth retrying
 _RETRYABLE = ('503', '429', 'UNAVAILABLE', 'RESOURCE_EXHAUSTED', 'rate limit', 'overloaded')
 
+# One genai.Client per API key for the whole process — each client owns an
+# HTTP session, so building one per extractor redid connection setup.
+_CLIENTS      = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _get_client(api_key):
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(api_key)
+        if client is None:
+            from google import genai
+            client = _CLIENTS[api_key] = genai.Client(api_key=api_key)
+        return client
+
+
+# Characters of source text included in a prompt
+PROMPT_CONTENT_CHARS = 8000
+
+# Rows per INSERT when saving extracted questions
+BULK_CREATE_BATCH_SIZE = 500
+
+
+# ── Response schema ──────────────────────────────────────────────────────────
+# Pins the reply to the shape process_questionnaire reads. Fields are nullable
+# rather than defaulted — the Gemini API rejects "default" in a schema.
+# `type` stays a plain string: off-list names are mapped through aliases.
+
+class _GeminiOptions(BaseModel):
+    a: Optional[str]
+    b: Optional[str]
+    c: Optional[str]
+    d: Optional[str]
+
+
+class _GeminiMatchingPair(BaseModel):
+    item:  str
+    match: str
+
+
+class _GeminiQuestion(BaseModel):
+    type:           str
+    question:       str
+    options:        Optional[_GeminiOptions]
+    column_a:       Optional[List[str]]
+    column_b:       Optional[List[str]]
+    matching_pairs: Optional[List[_GeminiMatchingPair]]
+    correct_answer: Optional[str]
+    explanation:    Optional[str]
+    difficulty:     Optional[str]
+    points:         Optional[int]
+
+
+class _GeminiResponse(BaseModel):
+    questions: List[_GeminiQuestion]
+
+
+# Ask Gemini for a bare JSON body that matches _GeminiResponse
+_GENERATE_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema':    _GeminiResponse,
+}
+
+
+def _truncate_at_paragraph(content: str, limit: int) -> str:
+    """Cut content to at most `limit` chars, preferring the last blank-line
+    boundary so the prompt never ends halfway through a question."""
+    if len(content) <= limit:
+        return content
+    cut = content.rfind('\n\n', 0, limit)
+    if cut < limit * 5 // 6:  # no boundary near the limit — hard cut
+        cut = limit
+    return content[:cut] + "\n... (content truncated)"
+
 
 class GeminiQuestionnaireExtractor:
     """Extract or generate questions from uploaded files using Google Gemini API"""
@@ -24,8 +109,7 @@ class GeminiQuestionnaireExtractor:
             raise ValueError("GEMINI_API_KEY not found in settings")
 
         try:
-            from google import genai
-            self.client = genai.Client(api_key=self.api_key)
+            self.client = _get_client(self.api_key)
             self.model  = 'gemini-2.5-flash'
         except ImportError:
             raise ImportError("Please install google-genai: pip install google-genai")
@@ -59,21 +143,19 @@ class GeminiQuestionnaireExtractor:
           - Handles multi-column layouts correctly (sorts blocks by position)
           - Falls back to PyPDF2 if fitz is unavailable.
         """
-        try:
-            import fitz  # PyMuPDF
+        if _PYMUPDF_AVAILABLE:
             return self._extract_from_pdf_pymupdf(file_path)
-        except ImportError:
-            pass
         # ── PyPDF2 fallback ────────────────────────────────────────────
         try:
-            text = ""
+            import PyPDF2
+            lines = []
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page in pdf_reader.pages:
                     extracted = page.extract_text()
                     if extracted:
-                        text += extracted + "\n"
-            return text
+                        lines.append(extracted + "\n")
+            return "".join(lines)
         except Exception as e:
             raise Exception(f"Error extracting PDF: {str(e)}") from e
 
@@ -88,8 +170,6 @@ class GeminiQuestionnaireExtractor:
              bottom rather than being interleaved.
           3. Bold / italic detection via font flags.
         """
-        import fitz
-
         COLUMN_BAND_TOLERANCE = 15  # px — spans within this y-delta share a row
 
         def is_reddish(color_int):
@@ -224,14 +304,13 @@ class GeminiQuestionnaireExtractor:
           RED colour → HIGHLIGHT → UNDERLINE → BOLD → ITALIC
         """
         try:
-            from docx.oxml.ns import qn
-            rPr = run._r.find(qn('w:rPr'))
+            rPr = run._r.find(_W + 'rPr')
             if rPr is not None:
 
                 # 1. Direct RGB colour -------------------------------------------
-                color_el = rPr.find(qn('w:color'))
+                color_el = rPr.find(_W + 'color')
                 if color_el is not None:
-                    val = (color_el.get(qn('w:val')) or '').strip()
+                    val = (color_el.get(_W + 'val') or '').strip()
                     if val and val.lower() not in ('auto', '000000', 'ffffff') and len(val) == 6:
                         try:
                             r_v = int(val[0:2], 16)
@@ -244,9 +323,9 @@ class GeminiQuestionnaireExtractor:
                             pass
 
                 # 2. Highlight ---------------------------------------------------
-                hl = rPr.find(qn('w:highlight'))
+                hl = rPr.find(_W + 'highlight')
                 if hl is not None:
-                    hl_val = (hl.get(qn('w:val')) or '').lower()
+                    hl_val = (hl.get(_W + 'val') or '').lower()
                     if hl_val and hl_val != 'none':
                         return 'HIGHLIGHT'
 
@@ -331,26 +410,29 @@ class GeminiQuestionnaireExtractor:
         reformat split Column A / Column B blocks into [TABLE] format.
         """
         try:
+            import docx
+            from docx.table import Table
+            from docx.text.paragraph import Paragraph
+
             document = docx.Document(file_path)
             parts    = []
 
-            para_map  = {p._element: p for p in document.paragraphs}
-            table_map = {t._element: t for t in document.tables}
+            # Wrap body children one at a time as they are reached, rather
+            # than materialising document.paragraphs / document.tables first.
+            body = document._body
 
             for child in document.element.body:
                 tag = child.tag.split('}')[-1]
 
                 # ── Plain paragraph ───────────────────────────────────────
                 if tag == 'p':
-                    para = para_map.get(child)
-                    if para and para.text.strip():
+                    para = Paragraph(child, body)
+                    if para.text.strip():
                         parts.append(self._extract_para_with_formatting(para))
 
                 # ── Real Word table ───────────────────────────────────────
                 elif tag == 'tbl':
-                    table = table_map.get(child)
-                    if table is None:
-                        continue
+                    table = Table(child, body)
 
                     grid = []
                     for row in table.rows:
@@ -499,12 +581,16 @@ class GeminiQuestionnaireExtractor:
 
     def _extract_from_excel(self, file_path: str) -> str:
         try:
-            workbook = openpyxl.load_workbook(file_path)
-            text = ""
-            for sheet in workbook.worksheets:
-                for row in sheet.iter_rows(values_only=True):
-                    text += " ".join([str(cell) for cell in row if cell]) + "\n"
-            return text
+            import openpyxl
+            workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                lines = []
+                for sheet in workbook.worksheets:
+                    for row in sheet.iter_rows(values_only=True):
+                        lines.append(" ".join([str(cell) for cell in row if cell]) + "\n")
+                return "".join(lines)
+            finally:
+                workbook.close()
         except Exception as e:
             raise Exception(f"Error extracting Excel: {str(e)}") from e
 
@@ -533,17 +619,19 @@ class GeminiQuestionnaireExtractor:
                 response = self.client.models.generate_content(
                     model=self.model,
                     contents=prompt,
+                    config=_GENERATE_CONFIG,
                 )
 
-                response_text = response.text
+                response_text = response.text or ''
 
-                if '```json' in response_text:
-                    response_text = response_text.split('```json')[1].split('```')[0]
-                elif '```' in response_text:
-                    response_text = response_text.split('```')[1].split('```')[0]
-
-                response_text = response_text.strip()
-                data = json.loads(response_text)
+                # The SDK validates the reply against the schema; only fall
+                # back to parsing the raw text if that produced nothing.
+                if response.parsed is not None:
+                    # Drop nulls so absent fields read as missing, as they
+                    # did in the free-form JSON (e.g. column_a → []).
+                    data = response.parsed.model_dump(exclude_none=True)
+                else:
+                    data = json.loads(response_text)
 
                 if 'questions' not in data or not data['questions']:
                     raise Exception("AI response did not contain any questions")
@@ -561,8 +649,10 @@ class GeminiQuestionnaireExtractor:
 
                 if is_transient and attempt < max_retries - 1:
                     wait = base_delay * (2 ** attempt)   # 3s → 6s → 12s
-                    print(f"[Gemini] transient error on attempt {attempt + 1}, "
-                          f"retrying in {wait}s… ({err_str[:120]})")
+                    logger.warning(
+                        "[Gemini] transient error on attempt %d, retrying in %ss… (%s)",
+                        attempt + 1, wait, err_str[:120],
+                    )
                     time.sleep(wait)
                     last_error = e
                     continue
@@ -577,7 +667,163 @@ class GeminiQuestionnaireExtractor:
     # =========================================================================
 
     def _build_extraction_prompt(self, content: str, question_types: List[str]) -> str:
-        return f"""You are a question scanner. Your ONLY job is to find and copy questions ALREADY WRITTEN in the text below.
+        return _EXTRACTION_PROMPT_TEMPLATE.format(
+            types_str=', '.join(question_types),
+            content=content,
+        )
+
+    def _build_generation_prompt(
+        self,
+        content: str,
+        question_types: List[str],
+        num_questions: int = 10,
+    ) -> str:
+        return _GENERATION_PROMPT_TEMPLATE.format(
+            content=_truncate_at_paragraph(content, PROMPT_CONTENT_CHARS),
+            types_str=', '.join(question_types),
+            num_questions=num_questions,
+            num_types=len(question_types),
+            total=num_questions * len(question_types),
+        )
+
+    # =========================================================================
+    # ORCHESTRATOR
+    # =========================================================================
+
+    def process_questionnaire(
+        self,
+        questionnaire,
+        question_types: List[str],
+        mode: str = 'extract',
+        num_questions: int = 10,
+    ):
+        from questionnaires.models import ExtractedQuestion, QuestionType
+
+        type_map = {}
+        for qt in QuestionType.objects.filter(is_active=True):
+            type_map[qt.name.lower()] = qt
+            type_map[qt.name]         = qt
+
+        aliases = {
+            'multiple_choice':   'multiple_choice',
+            'multiplechoice':    'multiple_choice',
+            'mcq':               'multiple_choice',
+            'true_false':        'true_false',
+            'truefalse':         'true_false',
+            'true/false':        'true_false',
+            'fill_in_the_blank': 'fill_blank',
+            'fill_blank':        'fill_blank',
+            'fill in the blank': 'fill_blank',
+            'identification':    'identification',
+            'essay':             'essay',
+            'matching':          'matching',
+            'enumeration':       'enumeration',
+            'short_answer':      'identification',
+            'scenario':          'identification',
+            'scenario-based':    'identification',
+            'scenario_based':    'identification',
+            'situation-based':   'identification',
+            'spot the error':    'identification',
+            'spot_the_error':    'identification',
+            'bonus':             'identification',
+            'problem solving':   'essay',
+            'problem_solving':   'essay',
+        }
+
+        file_path = questionnaire.file.path
+        content   = self.extract_text_from_file(file_path)
+
+        if not content.strip():
+            raise Exception("No text content could be extracted from the file")
+
+        extracted_data = self.extract_questions_with_ai(
+            content,
+            question_types,
+            mode=mode,
+            num_questions=num_questions,
+        )
+
+        new_questions = []
+
+        for q_data in extracted_data.get('questions', []):
+            try:
+                raw_type      = q_data.get('type', '').strip().lower()
+                resolved_name = aliases.get(raw_type, raw_type)
+                question_type = type_map.get(resolved_name) or type_map.get(raw_type)
+
+                if not question_type:
+                    logger.warning("Type '%s' not in DB, skipping.", raw_type)
+                    continue
+                if q_data.get('question') is None:
+                    logger.warning("Question without text, skipping.")
+                    continue
+
+                option_a = option_b = option_c = option_d = None
+                correct_answer = q_data.get('correct_answer', '')
+
+                if resolved_name == 'matching':
+                    col_a = q_data.get('column_a', [])
+                    col_b = q_data.get('column_b', [])
+                    pairs = q_data.get('matching_pairs', [])
+
+                    option_a = json.dumps(col_a, ensure_ascii=False)
+                    option_b = json.dumps(col_b, ensure_ascii=False)
+                    option_c = json.dumps(pairs, ensure_ascii=False)
+                    option_d = None
+
+                    if not correct_answer and pairs:
+                        correct_answer = ', '.join(
+                            f"{p['item'].split('.')[0].strip()}-{p['match']}"
+                            for p in pairs
+                            if isinstance(p, dict) and 'item' in p and 'match' in p
+                        )
+
+                elif q_data.get('options'):
+                    opts     = q_data['options']
+                    option_a = opts.get('a')
+                    option_b = opts.get('b')
+                    option_c = opts.get('c')
+                    option_d = opts.get('d')
+
+                # NOT NULL columns are coerced here — one null would fail
+                # the whole bulk insert rather than just this question.
+                new_questions.append(ExtractedQuestion(
+                    questionnaire  = questionnaire,
+                    question_type  = question_type,
+                    question_text  = q_data['question'],
+                    option_a       = option_a,
+                    option_b       = option_b,
+                    option_c       = option_c,
+                    option_d       = option_d,
+                    correct_answer = correct_answer or '',
+                    explanation    = q_data.get('explanation', ''),
+                    difficulty     = q_data.get('difficulty') or 'medium',
+                    points         = q_data.get('points') or 1,
+                ))
+
+            except Exception as e:
+                logger.error("Error preparing question: %s", e)
+                continue
+
+        # Coerce/drop bad rows first so one can't sink the whole batch
+        new_questions = ExtractedQuestion.storable(new_questions)
+        with transaction.atomic():
+            created_questions = ExtractedQuestion.objects.bulk_create(
+                new_questions, batch_size=BULK_CREATE_BATCH_SIZE,
+            )
+
+        if not created_questions:
+            raise Exception("No questions were found or created from the file")
+
+        return created_questions
+
+
+# ============================================================================
+# PROMPT TEMPLATES
+# ============================================================================
+# Built once at import; the builders only fill in the per-call fields.
+
+_EXTRACTION_PROMPT_TEMPLATE = """You are a question scanner. Your ONLY job is to find and copy questions ALREADY WRITTEN in the text below.
 
 STRICT RULES:
 - DO NOT create, generate, invent, or add any new questions.
@@ -653,7 +899,7 @@ When extracting the question text for correct_answer detection:
 ═══════════════════════════════════════════════════════
 QUESTION TYPES
 ═══════════════════════════════════════════════════════
-Use ONLY these types: {', '.join(question_types)}
+Use ONLY these types: {types_str}
 
 - "multiple_choice"  → has lettered options A B C D
 - "true_false"       → asks true or false
@@ -775,23 +1021,14 @@ RETURN — valid JSON only, no markdown, no extra text
 
 JSON:"""
 
-    def _build_generation_prompt(
-        self,
-        content: str,
-        question_types: List[str],
-        num_questions: int = 10,
-    ) -> str:
-        types_str = ', '.join(question_types)
-        total     = num_questions * len(question_types)
-
-        return f"""You are an expert teacher creating exam questions.
+_GENERATION_PROMPT_TEMPLATE = """You are an expert teacher creating exam questions.
 
 EDUCATIONAL CONTENT:
-{content[:8000]}
+{content}
 
 TASK:
 Generate exactly {num_questions} questions for EACH of these types: {types_str}
-Total = {num_questions} × {len(question_types)} = {total} questions.
+Total = {num_questions} × {num_types} = {total} questions.
 
 RULES:
 - Base every question on the content above only.
@@ -835,123 +1072,3 @@ Return ONLY valid JSON, no markdown.
 }}
 
 JSON:"""
-
-    # =========================================================================
-    # ORCHESTRATOR
-    # =========================================================================
-
-    def process_questionnaire(
-        self,
-        questionnaire,
-        question_types: List[str],
-        mode: str = 'extract',
-        num_questions: int = 10,
-    ):
-        from questionnaires.models import ExtractedQuestion, QuestionType
-
-        type_map = {}
-        for qt in QuestionType.objects.filter(is_active=True):
-            type_map[qt.name.lower()] = qt
-            type_map[qt.name]         = qt
-
-        aliases = {
-            'multiple_choice':   'multiple_choice',
-            'multiplechoice':    'multiple_choice',
-            'mcq':               'multiple_choice',
-            'true_false':        'true_false',
-            'truefalse':         'true_false',
-            'true/false':        'true_false',
-            'fill_in_the_blank': 'fill_blank',
-            'fill_blank':        'fill_blank',
-            'fill in the blank': 'fill_blank',
-            'identification':    'identification',
-            'essay':             'essay',
-            'matching':          'matching',
-            'enumeration':       'enumeration',
-            'short_answer':      'identification',
-            'scenario':          'identification',
-            'scenario-based':    'identification',
-            'scenario_based':    'identification',
-            'situation-based':   'identification',
-            'spot the error':    'identification',
-            'spot_the_error':    'identification',
-            'bonus':             'identification',
-            'problem solving':   'essay',
-            'problem_solving':   'essay',
-        }
-
-        file_path = questionnaire.file.path
-        content   = self.extract_text_from_file(file_path)
-
-        if not content.strip():
-            raise Exception("No text content could be extracted from the file")
-
-        extracted_data = self.extract_questions_with_ai(
-            content,
-            question_types,
-            mode=mode,
-            num_questions=num_questions,
-        )
-
-        created_questions = []
-
-        for q_data in extracted_data.get('questions', []):
-            try:
-                raw_type      = q_data.get('type', '').strip().lower()
-                resolved_name = aliases.get(raw_type, raw_type)
-                question_type = type_map.get(resolved_name) or type_map.get(raw_type)
-
-                if not question_type:
-                    print(f"Warning: type '{raw_type}' not in DB, skipping.")
-                    continue
-
-                option_a = option_b = option_c = option_d = None
-                correct_answer = q_data.get('correct_answer', '')
-
-                if resolved_name == 'matching':
-                    col_a = q_data.get('column_a', [])
-                    col_b = q_data.get('column_b', [])
-                    pairs = q_data.get('matching_pairs', [])
-
-                    option_a = json.dumps(col_a, ensure_ascii=False)
-                    option_b = json.dumps(col_b, ensure_ascii=False)
-                    option_c = json.dumps(pairs, ensure_ascii=False)
-                    option_d = None
-
-                    if not correct_answer and pairs:
-                        correct_answer = ', '.join(
-                            f"{p['item'].split('.')[0].strip()}-{p['match']}"
-                            for p in pairs
-                            if isinstance(p, dict) and 'item' in p and 'match' in p
-                        )
-
-                elif q_data.get('options'):
-                    opts     = q_data['options']
-                    option_a = opts.get('a')
-                    option_b = opts.get('b')
-                    option_c = opts.get('c')
-                    option_d = opts.get('d')
-
-                question = ExtractedQuestion.objects.create(
-                    questionnaire  = questionnaire,
-                    question_type  = question_type,
-                    question_text  = q_data['question'],
-                    option_a       = option_a,
-                    option_b       = option_b,
-                    option_c       = option_c,
-                    option_d       = option_d,
-                    correct_answer = correct_answer,
-                    explanation    = q_data.get('explanation', ''),
-                    difficulty     = q_data.get('difficulty', 'medium'),
-                    points         = q_data.get('points', 1),
-                )
-                created_questions.append(question)
-
-            except Exception as e:
-                print(f"Error creating question: {e}")
-                continue
-
-        if not created_questions:
-            raise Exception("No questions were found or created from the file")
-
-        return created_questions
\ No newline at end of file
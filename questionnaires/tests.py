@@ -1,3 +1,259 @@
-from django.test import TestCase
+import hashlib
+import re
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from accounts.models import Department, Subject, TeacherProfile
+from questionnaires.extractors import AIQuestionExtractor, AIQuestionSchema, extraction_cache_key
+from questionnaires.models import ExtractedQuestion, Questionnaire, QuestionType
+from questionnaires.pagination import CachedCountPaginator, CachedPagePaginator
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+ESSAY = {'type': 'essay', 'question': 'Explain normalisation.', 'answer': '', 'points': 5}
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QuestionnaireTestCase(TestCase):
+    """Shared fixture: one teacher with one uploaded .txt questionnaire."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Computing', code='CS')
+        self.subject    = Subject.objects.create(name='Databases', code='DB101')
+        self.teacher    = TeacherProfile.objects.create(
+            user=User.objects.create_user('teacher'),
+            department=self.department,
+            employee_id='T-1',
+        )
+        self.essay = QuestionType.objects.create(name='essay')
+        self.questionnaire = self.make_questionnaire('Midterm')
+
+    def make_questionnaire(self, title, content=b'1. Explain normalisation.'):
+        return Questionnaire.objects.create(
+            title=title,
+            department=self.department,
+            subject=self.subject,
+            uploader=self.teacher,
+            file=SimpleUploadedFile(f'{title}.txt', content),
+        )
+
+
+# ============================================================================
+# EXTRACTION CACHE
+# ============================================================================
+
+class ExtractionCacheTests(QuestionnaireTestCase):
+
+    def setUp(self):
+        super().setUp()
+        client = mock.patch('questionnaires.extractors._get_client')
+        client.start()
+        self.addCleanup(client.stop)
+
+    def extract(self, result, **kwargs):
+        extractor = AIQuestionExtractor()
+        with mock.patch.object(extractor, '_extract_with_ai', return_value=result) as ai:
+            created = extractor.process_questionnaire(self.questionnaire, ['essay'], **kwargs)
+        return created, ai.call_count
+
+    def cached_result(self):
+        self.questionnaire.file.open('rb')
+        try:
+            digest = hashlib.sha256(self.questionnaire.file.read()).hexdigest()
+        finally:
+            self.questionnaire.file.close()
+        return cache.get(extraction_cache_key(digest, ['essay']))
+
+    def test_miss_then_hit(self):
+        created, calls = self.extract(([ESSAY], True))
+        self.assertEqual((len(created), calls), (1, 1))
+        self.assertEqual(self.cached_result(), [ESSAY])
+
+        created, calls = self.extract(([], True))
+        self.assertEqual((len(created), calls), (1, 0))
+
+    def test_empty_result_is_not_cached(self):
+        created, calls = self.extract(([], True))
+        self.assertEqual((created, calls), ([], 1))
+        self.assertIsNone(self.cached_result())
+
+        # The next attempt goes back to the AI instead of replaying []
+        created, calls = self.extract(([ESSAY], True))
+        self.assertEqual((len(created), calls), (1, 1))
+
+    def test_partial_result_is_not_cached(self):
+        self.extract(([ESSAY], False))
+        self.assertIsNone(self.cached_result())
+
+    def test_use_cache_false_calls_the_ai_and_refreshes_the_entry(self):
+        self.extract(([ESSAY], True))
+        fresh = dict(ESSAY, question='Define a foreign key.')
+
+        created, calls = self.extract(([fresh], True), use_cache=False)
+        self.assertEqual(calls, 1)
+        self.assertEqual(created[0].question_text, 'Define a foreign key.')
+        self.assertEqual(self.cached_result(), [fresh])
+
+
+# ============================================================================
+# CHUNKED EXTRACTION
+# ============================================================================
+
+class ChunkedExtractionOrderTests(TestCase):
+    """260 ~1k-char questions: three chunks plus the shared answer-key tail."""
+
+    PARAGRAPHS = 260
+
+    def setUp(self):
+        self.extractor = AIQuestionExtractor.__new__(AIQuestionExtractor)
+        self.content   = '\n\n'.join(
+            f'Q{i}. ' + 'lorem ipsum ' * 80 for i in range(self.PARAGRAPHS)
+        )
+
+    def merged_numbers(self, call_ai):
+        with mock.patch.object(self.extractor, '_call_ai', side_effect=call_ai) as ai:
+            merged, complete = self.extractor._extract_with_ai(self.content, ['essay'])
+        self.assertTrue(complete)
+        self.assertGreater(ai.call_count, 2)
+        return [int(q['question'][1:]) for q in merged]
+
+    @staticmethod
+    def questions_in(text):
+        return [{'type': 'essay', 'question': q} for q in re.findall(r'\bQ\d+(?=\.)', text)]
+
+    def test_merge_keeps_document_order(self):
+        # The AI honours the "answer key context only" marker
+        numbers = self.merged_numbers(
+            lambda chunk, *args: self.questions_in(chunk.split('=== ANSWER KEY CONTEXT ONLY ===')[0])
+        )
+        self.assertEqual(numbers, list(range(self.PARAGRAPHS)))
+
+    def test_merge_keeps_document_order_when_context_is_extracted_anyway(self):
+        numbers = self.merged_numbers(lambda chunk, *args: self.questions_in(chunk))
+        self.assertEqual(numbers, list(range(self.PARAGRAPHS)))
+
+    def test_only_the_last_chunk_extracts_from_the_tail(self):
+        with mock.patch.object(self.extractor, '_call_ai', return_value=[]) as ai:
+            self.extractor._extract_with_ai(self.content, ['essay'])
+        chunks = [call.args[0] for call in ai.call_args_list]
+        self.assertTrue(all('ANSWER KEY CONTEXT ONLY' in c for c in chunks[:-1]))
+        self.assertNotIn('ANSWER KEY CONTEXT ONLY', chunks[-1])
+        self.assertTrue(self.content.endswith(chunks[-1]))
+
+
+# ============================================================================
+# AI RESPONSE SCHEMA
+# ============================================================================
+
+class AIQuestionSchemaPointsTests(TestCase):
+
+    def points(self, value, q_type='essay'):
+        return AIQuestionSchema.model_validate(
+            {'type': q_type, 'question': 'Q?', 'points': value}
+        ).points
+
+    def test_loose_points_are_coerced(self):
+        for value, expected in [
+            (3, 3), (1.5, 1), ('2.0', 2), ('2 pts', 2), (' 4', 4),
+            ('abc', 1), ('', 1), (None, 1), (float('nan'), 1),
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(self.points(value), expected)
+
+    def test_section_header_defaults_to_zero(self):
+        self.assertEqual(self.points('n/a', q_type='section_header'), 0)
+
+    def test_bad_points_never_drop_the_question(self):
+        extractor = AIQuestionExtractor.__new__(AIQuestionExtractor)
+        clean = extractor._normalize({'type': 'essay', 'question': 'Q?', 'points': '2 pts'})
+        self.assertIsNotNone(clean)
+        self.assertEqual(clean['points'], 2)
+
+
+# ============================================================================
+# BULK INSERT OF EXTRACTED QUESTIONS
+# ============================================================================
+
+class StorableQuestionsTests(QuestionnaireTestCase):
+
+    def row(self, **fields):
+        fields.setdefault('question_type', self.essay)
+        fields.setdefault('question_text', 'Q?')
+        return ExtractedQuestion(questionnaire=self.questionnaire, **fields)
+
+    def test_bad_rows_are_coerced_or_dropped_individually(self):
+        rows = [
+            self.row(question_text='kept', points='2 pts', difficulty='x' * 30, correct_answer=None),
+            self.row(question_text='   '),
+            self.row(question_text='nul\x00byte', points='3.0', difficulty='HARD'),
+            self.row(question_type=None, question_text='no type'),
+            self.row(question_text='huge', points=10 ** 12),
+        ]
+        created = ExtractedQuestion.objects.bulk_create(ExtractedQuestion.storable(rows))
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(
+            list(
+                self.questionnaire.extracted_questions.order_by('pk')
+                .values_list('question_text', 'points', 'difficulty', 'correct_answer')
+            ),
+            [
+                ('kept', 2, 'medium', ''),
+                ('nulbyte', 3, 'hard', ''),
+                ('huge', 1, 'medium', ''),
+            ],
+        )
+
+
+# ============================================================================
+# LIST PAGINATION CACHE
+# ============================================================================
+
+class CachedPaginatorTests(QuestionnaireTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            self.make_questionnaire(f'Quiz {i}')
+
+    def test_count_is_reused_for_the_same_query(self):
+        queryset = Questionnaire.objects.order_by('pk')
+        self.assertEqual(CachedCountPaginator(queryset, 2).count, 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(queryset.all(), 2).count, 5)
+
+    def test_count_is_keyed_on_the_filters(self):
+        self.assertEqual(CachedCountPaginator(Questionnaire.objects.order_by('pk'), 2).count, 5)
+        filtered = Questionnaire.objects.filter(title__startswith='Quiz').order_by('pk')
+        self.assertEqual(CachedCountPaginator(filtered, 2).count, 4)
+
+    def test_count_expires_rather_than_being_busted(self):
+        queryset = Questionnaire.objects.order_by('pk')
+        CachedCountPaginator(queryset, 2).count
+        self.make_questionnaire('Finals')
+
+        # Within the TTL the total is eventually consistent...
+        self.assertEqual(CachedCountPaginator(queryset, 2).count, 5)
+        # ...and recounted once the entry is gone
+        cache.clear()
+        self.assertEqual(CachedCountPaginator(queryset, 2).count, 6)
+
+    def test_cached_page_drops_deleted_rows(self):
+        queryset = Questionnaire.objects.order_by('pk')
+        first    = list(CachedPagePaginator(queryset, 2).page(1))
+        first[0].delete()
+
+        page = CachedPagePaginator(queryset, 2).page(1)
+        self.assertEqual([q.pk for q in page], [first[1].pk])
@@ -5,19 +5,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.views.decorators.http import require_POST
 from .models import (
     Questionnaire, ExtractedQuestion, QuestionType,
     WorkspaceFolder, WorkspaceFolderQuestion,
 )
+from .pagination import CachedPagePaginator
 from .forms import QuestionnaireUploadForm, QuestionnaireEditForm, QuestionnaireFilterForm
 from accounts.models import TeacherProfile, Department, Subject, ActivityLog
+from accounts.backends import get_teacher_or_404
 from .services import QuestionnaireExtractor
 from django.conf import settings
 from django.utils import timezone
+from django.utils.http import content_disposition_header
 import json as _json
 
 # Flat list of (value, label) tuples — evaluated once at import time so
@@ -32,17 +36,39 @@ QUESTION_TYPE_CHOICES = [
     ('enumeration',     'Enumeration'),
 ]
 
+DOCX_CONTENT_TYPE = (
+    'application/vnd.openxmlformats-officedocument'
+    '.wordprocessingml.document'
+)
+
+# Fields the browse/all-questionnaires search box matches against
+QUESTIONNAIRE_SEARCH_FIELDS = ('title', 'description', 'subject__name', 'subject__code')
+
+# Seconds a signed bucket URL for an original-file download stays valid
+DOWNLOAD_URL_EXPIRY = 300
+
+# Read size when streaming an original file from local storage
+FILE_RESPONSE_BLOCK_SIZE = 1 << 16
+
+
+def search_filter(search_query, fields):
+    """Q matching rows where any of `fields` contains search_query (case-insensitive)."""
+    q = Q()
+    for field in fields:
+        q |= Q(**{f'{field}__icontains': search_query})
+    return q
+
 
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
-        return x_forwarded_for.split(',')[0].strip()
+        return x_forwarded_for.partition(',')[0].strip()
     return request.META.get('REMOTE_ADDR')
 
 
 def get_extractor():
-    from .extractors import AIQuestionExtractor
-    return AIQuestionExtractor()
+    from .extractors import get_extractor as _get_ai_extractor
+    return _get_ai_extractor()
 
 
 def is_admin(user):
@@ -101,16 +127,38 @@ def _get_teacher_school_year_context(teacher):
     }
 
 
-def _restrict_subject_queryset(form, assigned_subject_ids):
+def _assigned_subject_queryset(assigned_subject_ids):
     """
-    Limit the 'subject' dropdown on a QuestionnaireUploadForm to only
+    Queryset for the 'subject' dropdown on a QuestionnaireUploadForm — only
     the subjects the teacher is assigned to for the current school year.
+    Pass it as subject_queryset= so the form skips its own default lookup.
     """
-    if 'subject' in form.fields:
-        form.fields['subject'].queryset = Subject.objects.filter(
-            pk__in=assigned_subject_ids,
-            is_archived=False,
-        ).order_by('code')
+    return Subject.objects.filter(
+        pk__in=assigned_subject_ids,
+        is_archived=False,
+    ).only('id', 'code', 'name').order_by('code')
+
+
+def _used_question_types(questions):
+    """
+    Distinct QuestionTypes among `questions`, minus section headers, in order
+    of first use. Reads the select_related rows the review template renders
+    anyway, so the type filter costs no query of its own.
+    """
+    seen = {}
+    for q in questions:
+        seen.setdefault(q.question_type_id, q.question_type)
+    return [qt for qt in seen.values() if qt.name != 'section_header']
+
+
+def _question_type_lookup():
+    """
+    ({name: QuestionType}, fallback) in one query. The fallback is the first
+    active type, used when a posted type name has no row.
+    """
+    qt_by_name = {qt.name: qt for qt in QuestionType.objects.order_by('pk')}
+    default_qt = next((qt for qt in qt_by_name.values() if qt.is_active), None)
+    return qt_by_name, default_qt
 
 
 def _save_manual_questions(request, questionnaire):
@@ -140,7 +188,9 @@ def _save_manual_questions(request, questionnaire):
         'matching':          'matching',
     }
 
-    created_ids = []
+    qt_by_name, default_qt = _question_type_lookup()
+
+    new_questions = []
     for i, uid in enumerate(manual_uids):
         q_text = manual_texts[i].strip()        if i < len(manual_texts)        else ''
         q_type = manual_types[i].strip()        if i < len(manual_types)        else ''
@@ -157,14 +207,11 @@ def _save_manual_questions(request, questionnaire):
             q_pts = 1
 
         resolved_type = type_name_map.get(q_type, q_type)
-        try:
-            q_type_obj = QuestionType.objects.get(name=resolved_type)
-        except QuestionType.DoesNotExist:
-            q_type_obj = QuestionType.objects.filter(is_active=True).first()
-            if not q_type_obj:
-                continue
+        q_type_obj    = qt_by_name.get(resolved_type, default_qt)
+        if not q_type_obj:
+            continue
 
-        new_q = ExtractedQuestion.objects.create(
+        new_questions.append(ExtractedQuestion(
             questionnaire  = questionnaire,
             question_type  = q_type_obj,
             question_text  = q_text,
@@ -177,10 +224,14 @@ def _save_manual_questions(request, questionnaire):
             option_b       = manual_opts_b[i] if i < len(manual_opts_b) else None,
             option_c       = manual_opts_c[i] if i < len(manual_opts_c) else None,
             option_d       = manual_opts_d[i] if i < len(manual_opts_d) else None,
-        )
-        created_ids.append(new_q.id)
+        ))
 
-    return created_ids
+    # One multi-row INSERT; PKs are populated on PostgreSQL. Bad rows are
+    # coerced or dropped first so one can't fail the whole batch.
+    new_questions = ExtractedQuestion.storable(new_questions)
+    with transaction.atomic():
+        created = ExtractedQuestion.objects.bulk_create(new_questions)
+    return [q.id for q in created]
 
 
 # ============================================================================
@@ -193,7 +244,7 @@ def upload_questionnaire(request):
         messages.error(request, 'Admins cannot upload questionnaires')
         return redirect('accounts:admin_dashboard')
 
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
 
     from accounts.models import TeacherSubjectAssignment
     from accounts.school_year_utils import resolve_view_semester
@@ -217,6 +268,8 @@ def upload_questionnaire(request):
         assigned_subject_ids = [a.subject_id for a in assignments]
         assigned_subjects    = [a.subject    for a in assignments]
 
+    subject_qs = _assigned_subject_queryset(assigned_subject_ids)
+
     def _base_context(form):
         return {
             'form':                form,
@@ -235,12 +288,12 @@ def upload_questionnaire(request):
                 f"{f' ({view_year.name})' if view_year else ''}. "
                 f"Switch back to the current semester to upload questionnaires."
             )
-            form = QuestionnaireUploadForm(user=request.user)
-            _restrict_subject_queryset(form, assigned_subject_ids)
+            form = QuestionnaireUploadForm(user=request.user, subject_queryset=subject_qs)
             return render(request, 'teacher_dashboard/upload_questionnaire.html', _base_context(form))
 
-        form = QuestionnaireUploadForm(request.POST, request.FILES, user=request.user)
-        _restrict_subject_queryset(form, assigned_subject_ids)
+        form = QuestionnaireUploadForm(
+            request.POST, request.FILES, user=request.user, subject_queryset=subject_qs,
+        )
 
         if form.is_valid():
             questionnaire = form.save(commit=False)
@@ -283,7 +336,6 @@ def upload_questionnaire(request):
                         'The AI could not extract any questions from this file. '
                         'Please make sure it includes an answer key and try again.',
                     )
-                    _restrict_subject_queryset(form, assigned_subject_ids)
                     return render(request, 'teacher_dashboard/upload_questionnaire.html', _base_context(form))
 
                 questionnaire.extraction_status = 'pending_review'
@@ -332,14 +384,12 @@ def upload_questionnaire(request):
                         f'Your file was not saved. Please try again.'
                     )
                 messages.error(request, up_msg)
-                _restrict_subject_queryset(form, assigned_subject_ids)
                 return render(request, 'teacher_dashboard/upload_questionnaire.html', _base_context(form))
         else:
             messages.error(request, 'Please correct the errors below.')
     else:
-        form = QuestionnaireUploadForm(user=request.user)
+        form = QuestionnaireUploadForm(user=request.user, subject_queryset=subject_qs)
 
-    _restrict_subject_queryset(form, assigned_subject_ids)
     return render(request, 'teacher_dashboard/upload_questionnaire.html', _base_context(form))
 
 # ============================================================================
@@ -352,7 +402,7 @@ def generate_questionnaire(request):
         messages.error(request, 'Admins cannot generate questionnaires.')
         return redirect('accounts:admin_dashboard')
 
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
 
     if request.method == 'POST':
         form = QuestionnaireUploadForm(request.POST, request.FILES, user=request.user)
@@ -535,11 +585,7 @@ def review_extracted_questions(request):
                             'error': 'Please select at least one question.',
                         })
                     messages.error(request, 'Please select at least one question.')
-                    question_types = QuestionType.objects.filter(
-                        id__in=extracted_questions.values_list(
-                            'question_type', flat=True
-                        ).distinct()
-                    ).exclude(name='section_header')
+                    question_types = _used_question_types(extracted_questions)
                     return render(request, 'teacher_dashboard/review_extracted.html', {
                         'questionnaire':  questionnaire,
                         'questions':      extracted_questions,
@@ -582,7 +628,7 @@ def review_extracted_questions(request):
                             'success': False,
                             'error': 'No workspace folder selected.',
                         })
-                    teacher = get_object_or_404(TeacherProfile, user=request.user)
+                    teacher = get_teacher_or_404(request.user)
                     try:
                         folder = WorkspaceFolder.objects.get(pk=folder_id, teacher=teacher)
                     except WorkspaceFolder.DoesNotExist:
@@ -591,19 +637,7 @@ def review_extracted_questions(request):
                             'error': 'Workspace folder not found.',
                         })
 
-                    added = already = 0
-                    for qid in all_saved_ids:
-                        try:
-                            q = ExtractedQuestion.objects.get(pk=qid)
-                        except ExtractedQuestion.DoesNotExist:
-                            continue
-                        _, created = WorkspaceFolderQuestion.objects.get_or_create(
-                            folder=folder, question=q
-                        )
-                        if created:
-                            added += 1
-                        else:
-                            already += 1
+                    added, _ = WorkspaceFolderQuestion.add_many(folder, all_saved_ids)
 
                     return JsonResponse({
                         'success':     True,
@@ -625,9 +659,7 @@ def review_extracted_questions(request):
                 return redirect('questionnaires:my_uploads')
 
         # GET
-        question_types = QuestionType.objects.filter(
-            id__in=extracted_questions.values_list('question_type', flat=True).distinct()
-        ).exclude(name='section_header')
+        question_types = _used_question_types(extracted_questions)
         return render(request, 'teacher_dashboard/review_extracted.html', {
             'questionnaire':  questionnaire,
             'questions':      extracted_questions,
@@ -739,7 +771,7 @@ def review_extracted_questions(request):
                     'from_my_uploads': False,
                 })
 
-            teacher     = get_object_or_404(TeacherProfile, user=request.user)
+            teacher     = get_teacher_or_404(request.user)
             subject     = get_object_or_404(Subject, pk=pending_meta['subject_id'])
             final_title = request.POST.get('final_title', '').strip() or pending_meta['title']
 
@@ -768,7 +800,9 @@ def review_extracted_questions(request):
                 'matching':          'matching',
             }
 
-            newly_created_ids = []
+            qt_by_name, default_qt = _question_type_lookup()
+
+            new_questions = []
             for idx_str in selected_indices:
                 try:
                     idx = int(idx_str)
@@ -776,13 +810,10 @@ def review_extracted_questions(request):
                 except (ValueError, IndexError):
                     continue
                 resolved_type = type_name_map.get(q['question_type'], q['question_type'])
-                try:
-                    q_type_obj = QuestionType.objects.get(name=resolved_type)
-                except QuestionType.DoesNotExist:
-                    q_type_obj = QuestionType.objects.filter(is_active=True).first()
-                    if not q_type_obj:
-                        continue
-                new_q = ExtractedQuestion.objects.create(
+                q_type_obj    = qt_by_name.get(resolved_type, default_qt)
+                if not q_type_obj:
+                    continue
+                new_questions.append(ExtractedQuestion(
                     questionnaire  = questionnaire,
                     question_type  = q_type_obj,
                     question_text  = q['question_text'],
@@ -795,8 +826,12 @@ def review_extracted_questions(request):
                     option_b       = q.get('option_b') or None,
                     option_c       = q.get('option_c') or None,
                     option_d       = q.get('option_d') or None,
-                )
-                newly_created_ids.append(new_q.id)
+                ))
+
+            new_questions = ExtractedQuestion.storable(new_questions)
+            with transaction.atomic():
+                created = ExtractedQuestion.objects.bulk_create(new_questions)
+            newly_created_ids = [q.id for q in created]
 
             manual_created_ids = _save_manual_questions(request, questionnaire)
             all_saved_ids      = newly_created_ids + manual_created_ids
@@ -827,19 +862,7 @@ def review_extracted_questions(request):
                         'success': False,
                         'error': 'Workspace folder not found.',
                     })
-                added = already = 0
-                for qid in all_saved_ids:
-                    try:
-                        q = ExtractedQuestion.objects.get(pk=qid)
-                    except ExtractedQuestion.DoesNotExist:
-                        continue
-                    _, created = WorkspaceFolderQuestion.objects.get_or_create(
-                        folder=folder, question=q
-                    )
-                    if created:
-                        added += 1
-                    else:
-                        already += 1
+                added, _ = WorkspaceFolderQuestion.add_many(folder, all_saved_ids)
                 return JsonResponse({
                     'success':     True,
                     'added':       added,
@@ -867,7 +890,6 @@ def review_extracted_questions(request):
         'questionnaire':  _FakeQuestionnaire(pending_meta),
         'questions':      fake_questions,
         'question_types': fake_types,
-        'total_points':   sum(q['points'] for q in pending_qs),
         'source':         source,
     })
 
@@ -883,7 +905,7 @@ def retry_extraction(request, pk):
     if request.user.is_staff:
         can_retry = True
     elif hasattr(request.user, 'teacher_profile'):
-        can_retry = questionnaire.uploader == request.user.teacher_profile
+        can_retry = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_retry = False
 
@@ -907,7 +929,9 @@ def retry_extraction(request, pk):
             type_names     = [qt.name for qt in question_types]
 
             extractor         = get_extractor()
-            created_questions = extractor.process_questionnaire(questionnaire, type_names)
+            created_questions = extractor.process_questionnaire(
+                questionnaire, type_names, use_cache=False,
+            )
 
             questionnaire.extraction_status = 'completed'
             questionnaire.is_extracted      = True
@@ -952,7 +976,7 @@ def review_extracted_questions_pk(request, pk):
     if request.user.is_staff:
         can_view = True
     elif hasattr(request.user, 'teacher_profile'):
-        can_view = questionnaire.uploader == request.user.teacher_profile
+        can_view = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_view = False
 
@@ -981,14 +1005,11 @@ def review_extracted_questions_pk(request, pk):
         source = request.POST.get('source', 'extract')
         # ... rest unchanged ...
 
-    question_types = QuestionType.objects.filter(
-        id__in=extracted_questions.values_list('question_type', flat=True).distinct()
-    ).exclude(name='section_header')
+    question_types = _used_question_types(extracted_questions)
     return render(request, 'teacher_dashboard/review_extracted.html', {
         'questionnaire':  questionnaire,
         'questions':      extracted_questions,
         'question_types': question_types,
-        'total_points':   sum(q.points for q in extracted_questions),
         'source':         source,
         'from_my_uploads': True,
         'is_read_only':   is_read_only,
@@ -1003,7 +1024,7 @@ def my_uploads(request):
     if request.user.is_staff:
         return redirect('accounts:admin_dashboard')
 
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
 
     from accounts.school_year_utils import resolve_view_semester
     from accounts.models import Semester
@@ -1017,6 +1038,7 @@ def my_uploads(request):
         Questionnaire.objects
         .filter(uploader=teacher, is_archived=False)
         .select_related('department', 'subject')
+        .order_by('-uploaded_at')
     )
 
     search_query = request.GET.get('search', '')
@@ -1029,9 +1051,7 @@ def my_uploads(request):
         )
     if search_query:
         questionnaires = questionnaires.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(subject__name__icontains=search_query)
+            search_filter(search_query, ('title', 'description', 'subject__name'))
         )
 
     archived_questionnaires = (
@@ -1070,7 +1090,7 @@ def edit_questionnaire(request, pk):
     if request.user.is_staff:
         can_edit = True
     elif hasattr(request.user, 'teacher_profile'):
-        can_edit = questionnaire.uploader == request.user.teacher_profile
+        can_edit = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_edit = False
 
@@ -1103,7 +1123,7 @@ def delete_questionnaire(request, pk):
     if request.user.is_staff:
         can_delete = True
     elif hasattr(request.user, 'teacher_profile'):
-        can_delete = questionnaire.uploader == request.user.teacher_profile
+        can_delete = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_delete = False
 
@@ -1137,7 +1157,7 @@ def archive_questionnaire(request, pk):
     elif hasattr(request.user, 'subadmin_profile') and request.user.subadmin_profile.is_active:
         can_act = questionnaire.department_id == request.user.subadmin_profile.department_id
     elif hasattr(request.user, 'teacher_profile'):
-        can_act = questionnaire.uploader == request.user.teacher_profile
+        can_act = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_act = False
 
@@ -1166,7 +1186,7 @@ def unarchive_questionnaire(request, pk):
     elif hasattr(request.user, 'subadmin_profile') and request.user.subadmin_profile.is_active:
         can_act = questionnaire.department_id == request.user.subadmin_profile.department_id
     elif hasattr(request.user, 'teacher_profile'):
-        can_act = questionnaire.uploader == request.user.teacher_profile
+        can_act = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_act = False
 
@@ -1192,7 +1212,7 @@ def permanent_delete_questionnaire(request, pk):
     if request.user.is_staff:
         can_act = True
     elif hasattr(request.user, 'teacher_profile'):
-        can_act = questionnaire.uploader == request.user.teacher_profile
+        can_act = questionnaire.uploader_id == request.user.teacher_profile.pk
     else:
         can_act = False
     if not can_act:
@@ -1220,7 +1240,7 @@ def browse_questionnaires(request):
     if request.user.is_staff:
         return redirect('questionnaires:all_questionnaires')
 
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
 
     assigned_subjects = teacher.subjects.all()
     if assigned_subjects.exists():
@@ -1276,10 +1296,7 @@ def browse_questionnaires(request):
         questionnaires = questionnaires.filter(curriculum_id=selected_curriculum_id)
     if search_query:
         questionnaires = questionnaires.filter(
-            Q(title__icontains=search_query)         |
-            Q(description__icontains=search_query)   |
-            Q(subject__name__icontains=search_query)  |
-            Q(subject__code__icontains=search_query)
+            search_filter(search_query, QUESTIONNAIRE_SEARCH_FIELDS)
         )
 
     from accounts.models import Curriculum, ProgramCurriculum
@@ -1302,9 +1319,10 @@ def browse_questionnaires(request):
     subjects = assigned_subjects.order_by('code') if assigned_subjects.exists() \
         else Subject.objects.filter(departments=teacher.department)
 
-    paginator   = Paginator(questionnaires, 12)
+    paginator   = CachedPagePaginator(questionnaires, 12)
     page_number = request.GET.get('page')
     page_obj    = paginator.get_page(page_number)
+    ExtractedQuestion.attach_counts(page_obj)
 
     ctx = {
         'page_obj':               page_obj,
@@ -1373,23 +1391,21 @@ def all_questionnaires(request):
         ).distinct()
     if search_query:
         questionnaires = questionnaires.filter(
-            Q(title__icontains=search_query)         |
-            Q(description__icontains=search_query)   |
-            Q(subject__name__icontains=search_query) |
-            Q(subject__code__icontains=search_query)
+            search_filter(search_query, QUESTIONNAIRE_SEARCH_FIELDS)
         )
 
-    departments = Department.objects.all()
-    subjects    = Subject.objects.all()
+    departments = Department.cached_choices()
+    subjects    = Subject.cached_choices()
     school_year_options = list(
         Questionnaire.objects.filter(
             is_extracted=True, extraction_status='completed',
             is_archived=False, school_year__gt=''
         ).values_list('school_year', flat=True).distinct().order_by('-school_year')
     )
-    paginator   = Paginator(questionnaires, 12)
+    paginator   = CachedPagePaginator(questionnaires, 12)
     page_number = request.GET.get('page')
     page_obj    = paginator.get_page(page_number)
+    ExtractedQuestion.attach_counts(page_obj)
 
     ctx = {
         'page_obj':               page_obj,
@@ -1422,7 +1438,11 @@ def download_questionnaire(request, pk):
     from .models import Download
     from .generators import generate_bisu_questionnaire
  
-    questionnaire = get_object_or_404(Questionnaire, pk=pk)
+    # The uploader is needed for the activity log below — join it here
+    # rather than paying two more round trips before the file goes out.
+    questionnaire = get_object_or_404(
+        Questionnaire.objects.select_related('uploader'), pk=pk,
+    )
  
     Download.objects.create(
         questionnaire=questionnaire,
@@ -1431,10 +1451,10 @@ def download_questionnaire(request, pk):
     )
  
     if hasattr(request.user, 'teacher_profile'):
-        if questionnaire.uploader != request.user.teacher_profile:
+        if questionnaire.uploader_id != request.user.teacher_profile.pk:
             ActivityLog.objects.create(
                 activity_type='questionnaire_downloaded',
-                user=questionnaire.uploader.user,
+                user_id=questionnaire.uploader.user_id,
                 description=(
                     f'{request.user.get_full_name()} downloaded '
                     f'your "{questionnaire.title}"'
@@ -1444,17 +1464,30 @@ def download_questionnaire(request, pk):
     download_type = request.GET.get('type', 'original')
  
     if download_type == 'original':
-        # questionnaire.file uses Django's storage API (FileField.open()),
-        # so once DEFAULT_FILE_STORAGE points at S3/R2 this works correctly
-        # without ever touching local disk.
+        filename = questionnaire.file.name.split('/')[-1]
+
+        # On S3/R2, send the browser to a short-lived signed URL that forces
+        # a download, so the bucket serves the bytes instead of this
+        # function proxying every chunk through Python.
+        if settings.USE_S3:
+            return redirect(questionnaire.file.storage.url(
+                questionnaire.file.name,
+                parameters={
+                    'ResponseContentDisposition': content_disposition_header(True, filename),
+                },
+                expire=DOWNLOAD_URL_EXPIRY,
+            ))
+
         try:
-            return FileResponse(
+            response = FileResponse(
                 questionnaire.file.open('rb'),
                 as_attachment=True,
-                filename=questionnaire.file.name.split('/')[-1],
+                filename=filename,
             )
         except (FileNotFoundError, ValueError):
             raise Http404("Original file not found")
+        response.block_size = FILE_RESPONSE_BLOCK_SIZE
+        return response
  
     elif download_type == 'generated':
         question_ids_param = request.GET.get('questions', '')
@@ -1482,19 +1515,14 @@ def download_questionnaire(request, pk):
             return redirect('questionnaires:my_uploads')
  
         try:
-            # generate_bisu_questionnaire now returns an in-memory buffer —
-            # nothing is written to local disk, so this works on Vercel.
-            buffer, filename = generate_bisu_questionnaire(questionnaire, selected_questions)
- 
-            response = FileResponse(
-                buffer,
-                as_attachment=True,
-                filename=filename,
-                content_type=(
-                    'application/vnd.openxmlformats-officedocument'
-                    '.wordprocessingml.document'
-                ),
+            # The document is written straight into the response body —
+            # nothing touches local disk and no intermediate buffer is kept,
+            # so this works on Vercel.
+            response = HttpResponse(content_type=DOCX_CONTENT_TYPE)
+            _, filename = generate_bisu_questionnaire(
+                questionnaire, selected_questions, target=response,
             )
+            response['Content-Disposition'] = content_disposition_header(True, filename)
             return response
  
         except Exception as e:
@@ -1654,7 +1682,7 @@ def workspace(request):
         messages.info(request, 'The workspace feature is for teachers only.')
         return redirect('accounts:admin_dashboard')
 
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
 
     active_folders = (
         WorkspaceFolder.objects
@@ -1719,7 +1747,7 @@ def workspace_create_folder(request):
         return JsonResponse({'error': 'Not allowed'}, status=403)
 
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
 
     try:
         body = _json.loads(request.body)
@@ -1754,7 +1782,7 @@ def workspace_create_folder(request):
 @require_POST
 def workspace_rename_folder(request, folder_id):
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher)
 
     try:
@@ -1776,7 +1804,7 @@ def workspace_rename_folder(request, folder_id):
 @require_POST
 def workspace_delete_folder(request, folder_id):
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher)
     name    = folder.name
     folder.delete()
@@ -1788,7 +1816,7 @@ def workspace_delete_folder(request, folder_id):
 @require_POST
 def workspace_archive_folder(request, folder_id):
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher, is_archived=False)
     folder.is_archived = True
     folder.save()
@@ -1800,7 +1828,7 @@ def workspace_archive_folder(request, folder_id):
 @require_POST
 def workspace_unarchive_folder(request, folder_id):
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher, is_archived=True)
     folder.is_archived = False
     folder.save()
@@ -1821,7 +1849,7 @@ def workspace_unarchive_folder(request, folder_id):
 @require_POST
 def workspace_permanent_delete_folder(request, folder_id):
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher, is_archived=True)
     name    = folder.name
     folder.delete()
@@ -1836,7 +1864,7 @@ def workspace_add_questions(request, folder_id):
         return JsonResponse({'error': 'Not allowed'}, status=403)
 
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher)
 
     try:
@@ -1869,13 +1897,9 @@ def workspace_add_questions(request, folder_id):
                 'folder_subject_name':    folder.subject.name if folder.subject else '',
             }, status=400)
 
-    added = already = 0
-    for q in allowed_questions:
-        _, created = WorkspaceFolderQuestion.objects.get_or_create(folder=folder, question=q)
-        if created:
-            added += 1
-        else:
-            already += 1
+    added, already = WorkspaceFolderQuestion.add_many(
+        folder, [q.pk for q in allowed_questions],
+    )
 
     cache.delete(f'workspace_folders_{teacher.id}')
     return JsonResponse({'added': added, 'already_existed': already})
@@ -1885,7 +1909,7 @@ def workspace_add_questions(request, folder_id):
 @require_POST
 def workspace_remove_question(request, folder_id, question_id):
     from django.core.cache import cache
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
     folder  = get_object_or_404(WorkspaceFolder, pk=folder_id, teacher=teacher)
     WorkspaceFolderQuestion.objects.filter(
         folder=folder, question_id=question_id
@@ -1920,7 +1944,7 @@ def download_workspace(request):
         messages.error(request, 'No valid question IDs provided.')
         return redirect('questionnaires:workspace')
  
-    teacher = get_object_or_404(TeacherProfile, user=request.user)
+    teacher = get_teacher_or_404(request.user)
  
     owned_ids = set(
         WorkspaceFolderQuestion.objects.filter(
@@ -1965,7 +1989,8 @@ def download_workspace(request):
     proxy = WorkspaceQuestionnaireProxy(first_quest, selected_questions)
  
     try:
-        buffer, _ = generate_bisu_questionnaire(proxy, selected_questions)
+        response = HttpResponse(content_type=DOCX_CONTENT_TYPE)
+        generate_bisu_questionnaire(proxy, selected_questions, target=response)
         filename = 'BISU_Workspace_Questionnaire.docx'
  
         ActivityLog.objects.create(
@@ -1978,13 +2003,6 @@ def download_workspace(request):
             ),
         )
  
-        response = FileResponse(
-            buffer,
-            content_type=(
-                'application/vnd.openxmlformats-officedocument'
-                '.wordprocessingml.document'
-            ),
-        )
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
  
@@ -2000,7 +2018,7 @@ def workspace_list_folders(request):
 
     from django.core.cache import cache
 
-    teacher   = get_object_or_404(TeacherProfile, user=request.user)
+    teacher   = get_teacher_or_404(request.user)
     cache_key = f'workspace_folders_{teacher.id}'
     cached    = cache.get(cache_key)
 
@@ -2011,18 +2029,21 @@ def workspace_list_folders(request):
         WorkspaceFolder.objects
         .filter(teacher=teacher)
         .select_related('subject')
-        .prefetch_related(
-            'folder_questions',
-            'folder_questions__question',
-            'folder_questions__question__question_type',
-        )
         .order_by('-created_at')
     )
 
+    # One query for every (folder, question) pair instead of a
+    # values_list() query per folder.
+    qids_by_folder = {}
+    for folder_id, question_id in WorkspaceFolderQuestion.objects.filter(
+        folder__teacher=teacher,
+    ).values_list('folder_id', 'question_id'):
+        qids_by_folder.setdefault(folder_id, []).append(question_id)
+
     folders_data     = []
     all_question_ids = []
     for folder in folders:
-        qids = list(folder.folder_questions.values_list('question_id', flat=True))
+        qids = qids_by_folder.get(folder.pk, [])
         all_question_ids.extend(qids)
         folders_data.append({
             'id':             folder.pk,
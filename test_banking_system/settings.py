@@ -173,6 +173,14 @@ LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# ProfileModelBackend joins the teacher/sub-admin profiles onto the session
+# user. ModelBackend stays listed because existing sessions record its path
+# in _auth_user_backend; dropping it would log every signed-in user out.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Anthropic API Configuration (reads from .env file)
 ANTHROPIC_API_KEY = config('ANTHROPIC_API_KEY', default='')
 